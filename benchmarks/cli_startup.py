@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Startup time of the command line tools
+
+Every command is run in a fresh interpreter and the best wall time of --repeat runs is reported, together with the
+heavy dependencies its module imports. The JSON output has the same layout as `run_benchmarks.py`, so
+`compare_benchmarks.py` works on it as well.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+from pycine.synthetic import write_synthetic_cine
+
+CLIS = ["pfs_meta", "pfs_raw", "pfs_events", "pfs_copy", "pfs_serve"]
+HEAVY_MODULES = ["numpy", "cv2", "timecode", "numba", "concurrent.futures", "http.server"]
+
+
+def run_times(args, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def imported_modules(cli_module):
+    code = f"import json, sys, {cli_module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    return json.loads(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True).stdout)
+
+
+def commands(cine_file):
+    yield "python", ["-c", "pass"], None
+    for name in CLIS:
+        yield f"{name} --help", ["-m", f"pycine.cli.{name}", "--help"], f"pycine.cli.{name}"
+    yield "pfs_meta show", ["-m", "pycine.cli.pfs_meta", "show", cine_file], "pycine.cli.pfs_meta"
+    yield "pfs_meta check", ["-m", "pycine.cli.pfs_meta", "check", cine_file], "pycine.cli.pfs_meta"
+
+
+@click.command()
+@click.option("--repeat", default=10, type=click.INT, show_default=True, help="Runs per command")
+@click.option("--output", type=click.Path(dir_okay=False, writable=True), help="Write the JSON results to this file")
+def cli(repeat, output):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        cine_file = os.path.join(directory, "synthetic.cine")
+        write_synthetic_cine(cine_file, count=4)
+
+        for command, args, module in commands(cine_file):
+            click.echo(f"Timing {command}", err=True)
+            times = run_times(args, repeat)
+            results.append(
+                {
+                    "benchmark": "startup",
+                    "format": None,
+                    "command": command,
+                    "seconds": min(times),
+                    "median_seconds": statistics.median(times),
+                    "imports": imported_modules(module) if module else [],
+                }
+            )
+
+    report = {
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "config": {"repeat": repeat},
+        "results": results,
+    }
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        click.echo(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Compare two result files of `run_benchmarks.py` and exit with status 1 if anything got slower than the tolerance
+"""
+
+import json
+import sys
+
+import click
+
+
+def key(result):
+    return result["benchmark"], result.get("format"), result.get("backend"), result.get("command")
+
+
+@click.command()
+@click.option("--tolerance", default=0.1, type=click.FLOAT, show_default=True, help="Allowed slowdown as a fraction")
+@click.argument("baseline", type=click.File())
+@click.argument("current", type=click.File())
+def cli(tolerance, baseline, current):
+    baseline = {key(result): result for result in json.load(baseline)["results"]}
+    regressions = 0
+    for result in json.load(current)["results"]:
+        before = baseline.get(key(result))
+        if before is None:
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        slower = ratio > 1 + tolerance
+        regressions += slower
+        name = " ".join(str(part) for part in key(result) if part)
+        click.echo(
+            f"{name:<40} {before['seconds'] * 1e3:10.2f} ms {result['seconds'] * 1e3:10.2f} ms {ratio:6.2f}x"
+            + ("  SLOWER" if slower else "")
+        )
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    cli()
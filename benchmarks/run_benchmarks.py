@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks on synthetic cine files
+
+Writes one clip per format with `pycine.synthetic` and measures header parsing, reading, unpacking, decoding per
+backend, the color pipeline and the pfs_raw export. Results are printed as JSON (or written with --output) so runs can
+be compared, e.g. with `compare_benchmarks.py`.
+"""
+
+import contextlib
+import importlib.metadata
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+
+import click
+import numpy as np
+
+from pycine.cli import pfs_raw
+from pycine.color import color_pipeline
+from pycine.decode import available_backends
+from pycine.file import read_header
+from pycine.raw import create_raw_array, frame_reader, read_bpp, read_image_data, unpack_raw_array
+from pycine.synthetic import FORMATS, write_synthetic_cine
+
+
+def pycine_version():
+    try:
+        return importlib.metadata.version("pycine")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def result(benchmark, image_format, seconds, frames, nbytes, **extra):
+    return {
+        "benchmark": benchmark,
+        "format": image_format,
+        **extra,
+        "seconds": seconds,
+        "frames_per_second": frames / seconds if frames else None,
+        "mb_per_second": nbytes / seconds / 2 ** 20 if nbytes else None,
+    }
+
+
+def run_format(directory, image_format, width, height, count, cfa, repeat):
+    cine_file = os.path.join(directory, f"synthetic_{image_format}.cine")
+    header = write_synthetic_cine(cine_file, width, height, count, image_format, cfa)
+    with open(cine_file, "rb") as f:
+        data = read_image_data(f, header, 0)
+    clip_bytes = len(data) * count
+
+    results = []
+
+    seconds = best_time(lambda: [read_header(cine_file) for _ in range(100)], repeat) / 100
+    results.append(result("read_header", image_format, seconds, 0, 0))
+
+    seconds = best_time(lambda: [None for _ in frame_reader(cine_file, header)], repeat)
+    results.append(result("frame_reader", image_format, seconds, count, clip_bytes))
+
+    seconds = best_time(lambda: [unpack_raw_array(data, header).copy() for _ in range(count)], repeat)
+    results.append(result("unpack", image_format, seconds, count, clip_bytes))
+
+    for backend in available_backends():
+        create_raw_array(data, header, backend=backend)  # warm up, e.g. JIT compilation
+        seconds = best_time(lambda: [create_raw_array(data, header, backend=backend) for _ in range(count)], repeat)
+        results.append(result("decode", image_format, seconds, count, clip_bytes, backend=backend))
+
+    if cfa:
+        raw_image = create_raw_array(data, header)
+        bpp = read_bpp(header)
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = best_time(lambda: [color_pipeline(raw_image, header["setup"], bpp) for _ in range(count)], repeat)
+        results.append(result("color_pipeline", image_format, seconds, count, clip_bytes))
+
+    with tempfile.TemporaryDirectory() as out_path:
+        args = ["--file-format", ".tif", cine_file, out_path]
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = best_time(lambda: pfs_raw.cli.main(args, standalone_mode=False), repeat)
+        results.append(result("pfs_raw_export", image_format, seconds, count, clip_bytes))
+
+    return results
+
+
+@click.command()
+@click.option("--width", default=2048, type=click.INT, show_default=True)
+@click.option("--height", default=1080, type=click.INT, show_default=True)
+@click.option("--count", default=16, type=click.INT, show_default=True, help="Frames per clip")
+@click.option("--cfa", default=3, type=click.INT, show_default=True, help="0 for monochrome clips")
+@click.option("--repeat", default=3, type=click.INT, show_default=True, help="Report the best of this many runs")
+@click.option("--format", "formats", multiple=True, type=click.Choice(list(FORMATS)), help="Default: all formats")
+@click.option("--output", type=click.Path(dir_okay=False, writable=True), help="Write the JSON results to this file")
+def cli(width, height, count, cfa, repeat, formats, output):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for image_format in formats or FORMATS:
+            click.echo(f"Benchmarking {image_format}", err=True)
+            results += run_format(directory, image_format, width, height, count, cfa, repeat)
+
+    report = {
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "pycine": pycine_version(),
+        "config": {"width": width, "height": height, "count": count, "cfa": cfa, "repeat": repeat},
+        "results": results,
+    }
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        click.echo(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,132 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+from os import PathLike
+from typing import Any, AsyncGenerator, Union
+
+import numpy as np
+
+from pycine.cache import FrameCache
+from pycine.file import Header
+from pycine.reader import CineReader
+
+
+class AsyncCineReader:
+    """
+    Read frames from asyncio code without blocking the event loop
+
+    Reading and decoding runs in `executor` (the loop's default thread pool if None) through a shared `CineReader`.
+    At most `in_flight` reads started with `aget` run at the same time. Cancelling an awaiting task cancels its read if
+    it has not started yet.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object or CineReader
+        A string containing a path to a cine file or an open reader
+    header : dict
+        A dictionary contains header information of the cine file
+    cache : FrameCache
+        Serve decoded frames from this cache if given
+    executor : concurrent.futures.Executor
+        Executor for reading and decoding
+    in_flight : int
+        Maximum number of concurrent reads
+    """
+
+    def __init__(
+        self,
+        cine_file: Union[str, bytes, PathLike, CineReader],
+        header: Header = None,
+        cache: FrameCache = None,
+        executor: Executor = None,
+        in_flight: int = 4,
+    ):
+        if isinstance(cine_file, CineReader):
+            self.reader = cine_file
+        else:
+            self.reader = CineReader(cine_file, header, cache)
+        self.executor = executor
+        self.in_flight = in_flight
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.reader)
+
+    @property
+    def header(self) -> Header:
+        return self.reader.header
+
+    def close(self):
+        self.reader.close()
+
+    async def aget(self, frame_index: int) -> np.ndarray:
+        """
+        Read and decode a frame (zero based index into the pImage table)
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.in_flight)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.reader.get, frame_index)
+
+    async def frames(self, start_frame: int = 1, count: int = None) -> AsyncGenerator[np.ndarray, Any]:
+        """
+        Get an async generator of raw images that keeps up to `in_flight` reads ahead of the consumer
+        """
+        if not count:
+            count = len(self) - start_frame + 1
+        loop = asyncio.get_running_loop()
+
+        pending = deque()
+        try:
+            for frame_index in range(start_frame - 1, start_frame - 1 + count):
+                pending.append(loop.run_in_executor(self.executor, self.reader.get, frame_index))
+                if len(pending) >= self.in_flight:
+                    yield await pending.popleft()
+
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for future in pending:
+                future.cancel()
+            # Reads that already started can not be cancelled, wait for them before the reader may be closed
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def aread_frames(
+    cine_file: Union[str, bytes, PathLike],
+    start_frame: int = 1,
+    count: int = None,
+    in_flight: int = 4,
+    executor: Executor = None,
+) -> AsyncGenerator[np.ndarray, Any]:
+    """
+    Get an async generator of raw images like `pycine.raw.frame_reader`
+
+    Usage: `async for raw_image in aread_frames("clip.cine"): ...`
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    start_frame : int
+        First frame to read (1 based like `frame_reader`)
+    count : int
+        maximum number of frames to get.
+    in_flight : int
+        Number of frames that are read and decoded ahead of the consumer
+    executor : concurrent.futures.Executor
+        Executor for reading and decoding. Defaults to the loop's default thread pool.
+    """
+    async with AsyncCineReader(cine_file, executor=executor, in_flight=in_flight) as reader:
+        frames = reader.frames(start_frame, count)
+        try:
+            async for raw_image in frames:
+                yield raw_image
+        finally:
+            await frames.aclose()
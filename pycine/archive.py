@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import threading
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import Any, Dict, Generator, Union
+
+import numpy as np
+
+from pycine.file import read_header
+from pycine.profiling import stage
+from pycine.raw import read_frames
+
+logger = logging.getLogger()
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+COMPRESSIONS = {"zlib": zipfile.ZIP_DEFLATED, "lzma": zipfile.ZIP_LZMA}
+
+
+def chunk_name(chunk_index: int) -> str:
+    return f"chunk-{chunk_index:06d}.npz"
+
+
+def write_chunk(path: str, frames: np.ndarray, compression: str = "zlib", level: int = None):
+    """
+    Write a stack of frames as a compressed .npz file that `np.load` can read
+
+    `np.savez_compressed` only supports zlib, so the zip archive is written directly to choose the compression.
+    """
+    with stage("compress", frames.nbytes):
+        tmp_path = path + ".tmp"
+        with zipfile.ZipFile(tmp_path, "w", compression=COMPRESSIONS[compression], compresslevel=level) as npz:
+            with npz.open("frames.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(frames), allow_pickle=False)
+        os.replace(tmp_path, path)
+
+
+def write_archive(
+    cine_file: Union[str, bytes, PathLike],
+    archive_path: Union[str, bytes, PathLike],
+    start_frame: int = 1,
+    count: int = None,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+    chunk: int = 32,
+    compression: str = "zlib",
+    level: int = None,
+    workers: int = None,
+) -> Dict[str, Any]:
+    """
+    Convert a clip to an archive of compressed chunks of decoded frames
+
+    The archive is a directory with one .npz file per `chunk` consecutive frames and an `index.json` that describes
+    the frames. Frames are decoded in order by `read_frames` and the chunks are compressed and written by a pool of
+    threads, at most two chunks per worker are in memory. The index is written last, so an interrupted conversion does
+    not leave an archive that looks complete.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    archive_path : str or file-like object
+        Directory of the archive, created if it does not exist
+    start_frame : int
+        First frame to convert (1 based like `frame_reader`)
+    count : int
+        Number of frames to convert. Defaults to all frames from `start_frame` on.
+    normalize : bool
+        If False, store the unpacked sensor values (see `create_raw_array`)
+    dtype : numpy dtype
+        uint8, uint16 (default) or float32 for normalized frames (see `create_raw_array`)
+    chunk : int
+        Number of frames per chunk. Reading a single frame decompresses its whole chunk.
+    compression : str
+        "zlib" or "lzma". lzma files are smaller but slower to write and read.
+    level : int
+        zlib compression level from 0 to 9, the default if None. lzma always uses its default preset.
+    workers : int
+        Number of compressing threads. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    index : dict
+        The contents of `index.json`
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compression must be one of {', '.join(COMPRESSIONS)}")
+    if chunk < 1:
+        raise ValueError("A chunk needs at least one frame")
+
+    header = read_header(cine_file)
+    image_count = header["cinefileheader"].ImageCount
+    if not count:
+        count = image_count - start_frame + 1
+    if start_frame < 1 or count < 1 or start_frame - 1 + count > image_count:
+        raise ValueError(f"Cannot convert {count} frames from frame {start_frame}, the clip has {image_count} frames")
+    if not workers:
+        workers = os.cpu_count() or 1
+
+    archive_path = os.fsdecode(archive_path)
+    os.makedirs(archive_path, exist_ok=True)
+    index_path = os.path.join(archive_path, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    raw_images, setup, bpp = read_frames(
+        cine_file, start_frame=start_frame, count=count, normalize=normalize, dtype=dtype
+    )
+    chunks = []
+    frames = []
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for i, raw_image in enumerate(raw_images):
+            frames.append(raw_image)
+            if len(frames) < chunk and i < count - 1:
+                continue
+
+            name = chunk_name(len(chunks))
+            chunks.append({"file": name, "start": i + 1 - len(frames), "count": len(frames)})
+            logger.debug(f"Writing {name}")
+            stack = np.stack(frames)
+            frames = []
+            pending.append(executor.submit(write_chunk, os.path.join(archive_path, name), stack, compression, level))
+            if len(pending) >= 2 * workers:
+                pending.popleft().result()
+
+        while pending:
+            pending.popleft().result()
+
+    index = {
+        "version": FORMAT_VERSION,
+        "source": os.path.basename(os.fsdecode(cine_file)),
+        "shape": [count] + list(stack.shape[1:]),
+        "dtype": stack.dtype.name,
+        "normalize": normalize,
+        "bpp": bpp,
+        "first_image_no": header["cinefileheader"].FirstImageNo + start_frame - 1,
+        "frame_rate": setup.FrameRate,
+        "compression": compression,
+        "chunk": chunk,
+        "chunks": chunks,
+    }
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(index_path + ".tmp", index_path)
+    return index
+
+
+class ArchiveReader:
+    """
+    Random access to the frames of an archive written by `write_archive`, indexed like `CineReader`
+
+    A frame is read by decompressing its chunk. The last `cache_chunks` chunks are kept, so reading neighbouring frames
+    decompresses every chunk once. Frames are read-only views on the cached chunks, use `.copy()` to modify them. A
+    reader can be shared between threads and pickled to send it to worker processes.
+
+    Parameters
+    ----------
+    archive_path : str or file-like object
+        Directory of the archive
+    cache_chunks : int
+        Number of decompressed chunks to keep in memory
+    """
+
+    def __init__(self, archive_path: Union[str, bytes, PathLike], cache_chunks: int = 2):
+        self.archive_path = os.fsdecode(archive_path)
+        with open(os.path.join(self.archive_path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        if self.index["version"] != FORMAT_VERSION:
+            raise ValueError(f"Archive format version {self.index['version']} is not supported")
+
+        self.shape = tuple(self.index["shape"])
+        self.dtype = np.dtype(self.index["dtype"])
+        self.normalize = self.index["normalize"]
+        self.bpp = self.index["bpp"]
+        self.cache_chunks = cache_chunks
+        self.starts = np.array([c["start"] for c in self.index["chunks"]] + [self.shape[0]], dtype=np.int64)
+
+        self._chunks: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_chunks"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, frame_index: int) -> np.ndarray:
+        if frame_index < 0:
+            frame_index += len(self)
+        if not 0 <= frame_index < len(self):
+            raise IndexError(f"Frame index {frame_index} out of range")
+        return self.get(frame_index)
+
+    def close(self):
+        with self._lock:
+            self._chunks.clear()
+
+    def chunk(self, chunk_index: int) -> np.ndarray:
+        """
+        Get the read-only `(count, height, width)` frames of a chunk
+        """
+        with self._lock:
+            frames = self._chunks.get(chunk_index)
+            if frames is not None:
+                self._chunks.move_to_end(chunk_index)
+                return frames
+
+        path = os.path.join(self.archive_path, self.index["chunks"][chunk_index]["file"])
+        with stage("decompress") as s, np.load(path, allow_pickle=False) as npz:
+            frames = npz["frames"]
+            s.nbytes = frames.nbytes
+        frames.setflags(write=False)
+
+        with self._lock:
+            self._chunks[chunk_index] = frames
+            while len(self._chunks) > self.cache_chunks:
+                self._chunks.popitem(last=False)
+        return frames
+
+    def get(self, frame_index: int, normalize: bool = None, dtype: np.dtype = None) -> np.ndarray:
+        """
+        Get a frame (zero based index)
+
+        Frames are stored with the options of `write_archive`. `normalize` and `dtype` are only checked against them,
+        so code written for `CineReader.get` works unchanged.
+        """
+        if normalize is not None and normalize != self.normalize:
+            raise ValueError(f"The archive holds {'normalized' if self.normalize else 'raw'} frames")
+        if dtype is not None and np.dtype(dtype) != self.dtype:
+            raise ValueError(f"The archive holds {self.dtype} frames")
+
+        chunk_index = int(np.searchsorted(self.starts, frame_index, side="right")) - 1
+        return self.chunk(chunk_index)[frame_index - self.starts[chunk_index]]
+
+    def frames(
+        self, start_frame: int = 1, count: int = None, normalize: bool = None, dtype: np.dtype = None
+    ) -> Generator[np.ndarray, Any, None]:
+        """
+        Get a generator of frames like `CineReader.frames`
+        """
+        if not count:
+            count = len(self) - start_frame + 1
+        for frame_index in range(start_frame - 1, start_frame - 1 + count):
+            yield self.get(frame_index, normalize, dtype)
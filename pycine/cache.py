@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from os import PathLike
+from typing import Any, Generator, Hashable, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from pycine.file import Header
+from pycine.raw import create_raw_array, read_image_data
+
+logger = logging.getLogger()
+
+ClipId = Tuple[str, int, int]
+CacheKey = Tuple[ClipId, int, Hashable]
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_bytes: int
+
+
+def clip_id(cine_file: Union[str, bytes, PathLike]) -> ClipId:
+    """
+    Identify a clip by its real path, size and modification time
+
+    A clip that is rewritten (e.g. by `pfs_meta set`) gets a new identity, so stale frames are never served.
+    """
+    stat = os.stat(cine_file)
+    return os.path.realpath(os.fsdecode(cine_file)), stat.st_size, stat.st_mtime_ns
+
+
+class FrameCache:
+    """
+    A thread-safe LRU cache for decoded frames that is bounded by the number of bytes it holds
+
+    Cached frames are marked read-only because they are shared between all consumers. Use `.copy()` if you need to
+    modify a frame. A pickled cache (e.g. of a reader sent to a worker process) arrives empty with the same bound.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound for the summed `nbytes` of all cached frames. Frames larger than this are never cached.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self._frames: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        return {"max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_bytes"])
+
+    @staticmethod
+    def key(clip: ClipId, frame_index: int, **options: Any) -> CacheKey:
+        return clip, frame_index, tuple(sorted(options.items()))
+
+    def get(self, key: CacheKey) -> Optional[np.ndarray]:
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key: CacheKey, frame: np.ndarray) -> np.ndarray:
+        frame.setflags(write=False)
+        if frame.nbytes > self.max_bytes:
+            return frame
+
+        with self._lock:
+            old = self._frames.pop(key, None)
+            if old is not None:
+                self._size -= old.nbytes
+            self._frames[key] = frame
+            self._size += frame.nbytes
+
+            while self._size > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self._size -= evicted.nbytes
+                self.evictions += 1
+
+        return frame
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._frames), self._size, self.max_bytes)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._frames
+
+
+frame_cache = FrameCache()
+
+
+def cached_frame_reader(
+    cine_file: Union[str, bytes, PathLike],
+    header: Header,
+    start_frame: int = 1,
+    count: int = None,
+    cache: FrameCache = None,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+) -> Generator[np.ndarray, Any, None]:
+    """
+    Like `pycine.raw.frame_reader` but serves decoded frames from a `FrameCache`
+
+    The file is only opened if at least one of the requested frames is missing from the cache.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    header : dict
+        A dictionary contains header information of the cine file
+    start_frame : int
+        First frame to read (1 based like `frame_reader`)
+    count : int
+        maximum number of frames to get.
+    cache : FrameCache
+        The cache to use. Defaults to the module wide `frame_cache`.
+    normalize : bool
+        If False, get the unpacked sensor values (see `create_raw_array`)
+    dtype : numpy dtype
+        uint8, uint16 (default) or float32 for normalized frames (see `create_raw_array`)
+
+    Returns
+    -------
+    raw_image_generator : generator
+        A generator for read-only raw images
+    """
+    if cache is None:
+        cache = frame_cache
+    if not count:
+        count = header["cinefileheader"].ImageCount
+
+    clip = clip_id(cine_file)
+    f = None
+    try:
+        for frame_index in range(start_frame - 1, start_frame - 1 + count):
+            key = cache.key(clip, frame_index, normalize=normalize, dtype=dtype)
+            raw_image = cache.get(key)
+            if raw_image is None:
+                logger.debug(f"Frame cache miss for frame {frame_index + 1}")
+                if f is None:
+                    f = open(cine_file, "rb")
+                data = read_image_data(f, header, frame_index)
+                raw_image = cache.put(key, create_raw_array(data, header, normalize, dtype))
+            yield raw_image
+    finally:
+        if f is not None:
+            f.close()
@@ -0,0 +1,195 @@
+import threading
+from functools import lru_cache
+from os import PathLike
+from typing import Tuple, Union
+
+import numpy as np
+
+from pycine.cache import ClipId, clip_id
+from pycine.file import read_header, Header
+from pycine.profiling import profiled
+from pycine.raw import read_bpp
+from pycine.stats import temporal_reduce
+
+
+class Calibration:
+    """
+    Dark frame subtraction and flat field correction of normalized frames
+
+    A frame is corrected as `(frame - dark) * gain`, where `dark` and `gain` are in the units of float32 frames
+    (`[0, 1]`). Pass a calibration to `pycine.raw.create_raw_array` (or `frame_reader` and `read_frames`) to apply it
+    while decoding. The numba backend unpacks, linearizes, corrects, rescales and converts every pixel in a single pass.
+    The numpy reference backend decodes to float32 and corrects the frame in place with `apply`.
+
+    Parameters
+    ----------
+    dark : np.ndarray
+        Mean of frames taken with the lens capped
+    gain : np.ndarray
+        Per-pixel gain, no flat field correction if None
+    """
+
+    def __init__(self, dark: np.ndarray, gain: np.ndarray = None):
+        self.dark = np.array(dark, dtype=np.float32)
+        self.gain = np.ones_like(self.dark) if gain is None else np.array(gain, dtype=np.float32)
+        if self.dark.ndim != 2 or self.gain.shape != self.dark.shape:
+            raise ValueError("dark and gain must be images of the same shape")
+        self.dark.setflags(write=False)
+        self.gain.setflags(write=False)
+
+        self._scaled_gain = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"dark": self.dark, "gain": self.gain}
+
+    def __setstate__(self, state):
+        self.__init__(state["dark"], state["gain"])
+
+    @classmethod
+    def from_frames(cls, dark: np.ndarray, flat: np.ndarray = None) -> "Calibration":
+        """
+        Create a calibration from a mean dark frame and a mean flat field frame in the units of float32 frames
+
+        The gain scales every pixel's response to the flat field to the mean response, pixels that do not respond to
+        the flat field are left uncorrected.
+        """
+        if flat is None:
+            return cls(dark)
+
+        response = np.asarray(flat, dtype=np.float64) - dark
+        responding = response > 0
+        if not responding.any():
+            raise ValueError("The flat field is not brighter than the dark frame")
+        gain = np.ones(response.shape, dtype=np.float64)
+        np.divide(response[responding].mean(), response, out=gain, where=responding)
+        return cls(dark, gain)
+
+    @classmethod
+    def from_clips(
+        cls,
+        dark_file: Union[str, bytes, PathLike],
+        flat_file: Union[str, bytes, PathLike] = None,
+        count: int = None,
+        workers: int = None,
+    ) -> "Calibration":
+        """
+        Create a calibration by averaging the frames of a dark clip and a flat field clip
+
+        The clips are streamed with `pycine.stats.temporal_reduce`, so they may be of any length. They must have the
+        geometry and the black and white levels of the clips the calibration is applied to.
+
+        Parameters
+        ----------
+        dark_file : str or file-like object
+            Clip taken with the lens capped
+        flat_file : str or file-like object
+            Clip of an evenly lit, featureless target. No flat field correction if None.
+        count : int
+            Only average the first `count` frames of each clip
+        workers : int
+            Number of worker threads. Defaults to the number of CPUs.
+        """
+        dark = mean_frame(dark_file, count, workers)
+        flat = mean_frame(flat_file, count, workers) if flat_file is not None else None
+        if flat is not None and flat.shape != dark.shape:
+            raise ValueError("The dark and flat field clips have different geometries")
+        return cls.from_frames(dark, flat)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.dark.shape
+
+    def scaled_gain(self, max_value: float) -> np.ndarray:
+        """
+        Get the gain multiplied by the maximum value of the output range, computed once per range
+        """
+        with self._lock:
+            gain = self._scaled_gain.get(max_value)
+            if gain is None:
+                gain = self.gain * np.float32(max_value)
+                gain.setflags(write=False)
+                self._scaled_gain[max_value] = gain
+            return gain
+
+    def output_range(self, header: Header, dtype: np.dtype = None) -> Tuple[np.dtype, float]:
+        """
+        Get the type and the maximum value of calibrated frames of a clip, see `apply`
+        """
+        height, width = header["bitmapinfoheader"].biHeight, header["bitmapinfoheader"].biWidth
+        if (height, width) != self.shape:
+            raise ValueError(f"The calibration is for {self.shape[1]}x{self.shape[0]} frames")
+
+        dtype = np.dtype(dtype or np.uint16)
+        if dtype == np.float32:
+            return dtype, 1.0
+        if dtype == np.uint8:
+            return dtype, 255.0
+        if dtype == np.uint16:
+            return dtype, float(2 ** read_bpp(header) - 1)
+        raise ValueError("Only uint8, uint16 and float32 frames are supported")
+
+    @profiled("calibrate")
+    def apply(self, frame: np.ndarray, header: Header, dtype: np.dtype = None, out: np.ndarray = None) -> np.ndarray:
+        """
+        Correct a float32 frame in place and convert it to `dtype`
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            A writable frame decoded to float32, it is overwritten
+        header : dict
+            A dictionary contains header information of the cine file
+        dtype : numpy dtype
+            uint8, uint16 (default) or float32, scaled like the frames of `create_raw_array`. Integer frames are
+            clipped to their range, float32 frames keep values below 0 and above 1.
+        out : np.ndarray
+            Write the result into this array instead of a new one
+
+        Returns
+        -------
+        raw_image : np.ndarray
+            The corrected frame
+        """
+        dtype, max_value = self.output_range(header, dtype)
+        np.subtract(frame, self.dark, out=frame)
+        np.multiply(frame, self.scaled_gain(max_value), out=frame)
+        if dtype != np.float32:
+            np.clip(frame, 0, max_value, out=frame)
+            if dtype == np.uint8:
+                # Round like the uint8 normalization LUT
+                np.add(frame, 0.5, out=frame)
+
+        if out is None:
+            if dtype == np.float32:
+                return frame
+            out = np.empty(frame.shape, dtype=dtype)
+        np.copyto(out, frame, casting="unsafe")
+        return out
+
+
+def mean_frame(cine_file: Union[str, bytes, PathLike], count: int = None, workers: int = None) -> np.ndarray:
+    """
+    Get the per-pixel mean of the frames of a clip in the units of float32 frames (`[0, 1]`)
+    """
+    header = read_header(cine_file)
+    mean = temporal_reduce(cine_file, "mean", count=count, workers=workers)
+    return mean / (2 ** read_bpp(header) - 1)
+
+
+@lru_cache(maxsize=8)
+def _cached_calibration(dark: ClipId, flat: ClipId, dark_file, flat_file, count: int) -> Calibration:
+    return Calibration.from_clips(dark_file, flat_file, count)
+
+
+def load_calibration(
+    dark_file: Union[str, bytes, PathLike], flat_file: Union[str, bytes, PathLike] = None, count: int = None
+) -> Calibration:
+    """
+    Like `Calibration.from_clips` but build the calibration only once per set of clips and sensor geometry
+
+    Clips are identified by path, size and modification time (see `pycine.cache.clip_id`), so recording a new dark
+    clip under the same name invalidates the cached calibration.
+    """
+    flat_id = clip_id(flat_file) if flat_file is not None else None
+    return _cached_calibration(clip_id(dark_file), flat_id, dark_file, flat_file, count)
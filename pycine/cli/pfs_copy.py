@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import hashlib
+import sys
+
+import click
+
+from pycine import profiling
+from pycine.offload import destination_path, offload, verify
+
+
+@click.command(help="Copy a clip to one or more destinations while hashing it and every frame")
+@click.option("--algorithm", default="md5", type=click.Choice(sorted(hashlib.algorithms_guaranteed)))
+@click.option("--chunk-size", default=64, type=click.IntRange(min=1), help="Read size in MiB.")
+@click.option("--no-resume", is_flag=True, help="Start over instead of continuing interrupted copies.")
+@click.option("--no-frame-hashes", is_flag=True, help="Only hash the whole file.")
+@click.option("--verify", "verify_copies", is_flag=True, help="Read back every copy and check it after copying.")
+@click.option("--profile", is_flag=True, help="Print the time spent in each processing stage.")
+@click.argument("source", type=click.Path(exists=True, readable=True, dir_okay=False, file_okay=True))
+@click.argument("destinations", nargs=-1, required=True, type=click.Path(writable=True))
+@click.version_option()
+def cli(algorithm, chunk_size, no_resume, no_frame_hashes, verify_copies, profile, source, destinations):
+    if profile:
+        profiling.enable()
+
+    manifest = offload(
+        source,
+        destinations,
+        algorithm=algorithm,
+        chunk_size=chunk_size * 2 ** 20,
+        resume=not no_resume,
+        frame_hashes=not no_frame_hashes,
+    )
+    click.echo(f"{source}: {algorithm} {manifest['hash']}")
+    if profile:
+        click.echo(profiling.report(), err=True)
+
+    if verify_copies:
+        failed = False
+        for destination in destinations:
+            intact, bad_frames = verify(destination_path(source, destination))
+            if bad_frames:
+                click.secho(f"{destination}: corrupt frames {', '.join(str(i + 1) for i in bad_frames)}", fg="red")
+            elif not intact:
+                click.secho(f"{destination}: hash mismatch outside of the image data", fg="red")
+            else:
+                click.secho(f"{destination}: verified", fg="green")
+            failed = failed or not intact
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import click
+
+from pycine import profiling
+from pycine.events import find_events
+
+
+@click.command(help="Find frame ranges with motion or other sudden changes")
+@click.option("--threshold", default=1e-3, type=float, help="Minimum mean squared difference of normalized frames.")
+@click.option("--stride", default=8, type=click.IntRange(min=1), help="Compare every n-th frame in the coarse pass.")
+@click.option("--downsample", default=4, type=click.IntRange(min=1), help="Use every n-th pixel in the coarse pass.")
+@click.option("--roi", nargs=4, type=int, default=None, help="Region of interest: TOP BOTTOM LEFT RIGHT.")
+@click.option("--coarse", is_flag=True, help="Skip the full resolution pass.")
+@click.option("--profile", is_flag=True, help="Print the time spent in each processing stage.")
+@click.argument("clips", nargs=-1, type=click.Path(exists=True, readable=True, dir_okay=False, file_okay=True))
+@click.version_option()
+def cli(threshold, stride, downsample, roi, coarse, profile, clips):
+    if profile:
+        profiling.enable()
+
+    for cine_file in clips:
+        events = find_events(
+            cine_file, threshold=threshold, stride=stride, roi=roi or None, downsample=downsample, refine=not coarse
+        )
+        if not events:
+            click.echo(f"{cine_file}: no events")
+        for first, last in events:
+            click.echo(f"{cine_file}: frames {first}-{last} (--start-frame {first} --count {last - first + 1})")
+
+    if profile:
+        click.echo(profiling.report(), err=True)
+
+
+if __name__ == "__main__":
+    cli()
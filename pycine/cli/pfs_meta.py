@@ -3,12 +3,13 @@ import sys
 from textwrap import dedent
 
 import click
-from timecode import Timecode
 
-from pycine.file import read_header, write_header
+from pycine.metadata import read_metadata, write_header
 
 
 def show_metadata(header, cine_file):
+    from timecode import Timecode
+
     record_rate = header["setup"].FrameRate
     playback_rate = header["setup"].fPbRate
     timecode_rate = header["setup"].fTcRate
@@ -74,7 +75,7 @@ def cli():
 def show(clips):
     for cine_file in clips:
         try:
-            source_header = read_header(cine_file)
+            source_header = read_metadata(cine_file)
             ensure_minimal_software_version(source_header, cine_file, 709)
 
             show_metadata(source_header, cine_file)
@@ -84,6 +85,42 @@ def show(clips):
             click.echo()
 
 
+@cli.command(help="Check that all frames of the clips are present")
+@click.option("--workers", default=8, type=click.IntRange(min=1), help="Number of clips checked in parallel.")
+@click.argument("clips", nargs=-1, type=click.Path(exists=True, readable=True, dir_okay=False, file_okay=True))
+def check(workers, clips):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+
+    from pycine.file import check_frames
+
+    def check_clip(cine_file):
+        try:
+            return check_frames(cine_file)
+        except Exception as e:
+            return e
+
+    damaged = False
+    with ThreadPoolExecutor(workers) as executor:
+        for cine_file, valid in zip(clips, executor.map(check_clip, clips)):
+            if isinstance(valid, Exception):
+                click.secho(f"{cine_file}: could not be read: {valid}", fg="red")
+                damaged = True
+            elif valid.all():
+                click.secho(f"{cine_file}: OK, {len(valid)} frames", fg="green")
+            else:
+                first_damaged = int(np.argmin(valid)) + 1
+                click.secho(
+                    f"{cine_file}: {valid.sum()} of {len(valid)} frames intact, first damaged frame {first_damaged}",
+                    fg="red",
+                )
+                damaged = True
+
+    if damaged:
+        sys.exit(1)
+
+
 # noinspection PyPep8Naming
 @cli.command(help="Copy metadata from a source clip")
 @click.option("--all_metadata", help="Copy color temperature, color correction and tone curve.", is_flag=True)
@@ -96,11 +133,11 @@ def show(clips):
 @click.argument("source", nargs=1, type=click.Path(exists=True, readable=True))
 @click.argument("destinations", nargs=-1, type=click.Path(exists=True, readable=True, dir_okay=False, file_okay=True))
 def copy(all_metadata, wb, tone, source, destinations):
-    source_header = read_header(source)
+    source_header = read_metadata(source)
     ensure_minimal_software_version(source_header, source, 709)
 
     for d in destinations:
-        dest_header = read_header(d)
+        dest_header = read_metadata(d)
         ensure_minimal_software_version(dest_header, d, 709)
 
         if wb or all_metadata:
@@ -137,7 +174,7 @@ def copy(all_metadata, wb, tone, source, destinations):
 @click.argument("destinations", nargs=-1, type=click.Path(exists=True, readable=True, dir_okay=False, file_okay=True))
 def set_(destinations, temp, cc, record_fps, playback_fps, timecode_fps, tone, first_frame_number):
     for d in destinations:
-        dest_header = read_header(d)
+        dest_header = read_metadata(d)
         ensure_minimal_software_version(dest_header, d, 709)
 
         if temp:
@@ -1,34 +1,77 @@
 #!/usr/bin/env python3
 import os
+import sys
 
 import click
-import cv2
 import numpy as np
 
+from pycine import profiling
 from pycine.color import color_pipeline, resize
+from pycine.export import export_npy
 from pycine.raw import read_frames
 
 
 def display(image_8bit):
+    import cv2
+
     cv2.imshow("image", image_8bit)
     cv2.waitKey(0)
     cv2.destroyAllWindows()
 
 
-@click.command()
+class DefaultCommandGroup(click.Group):
+    """
+    A group that runs its `export` command if no other command is given, so `pfs_raw CINE_FILE` keeps working
+    """
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] not in ("--help", "--version"):
+            args = ["export"] + args
+        return super().parse_args(ctx, args)
+
+
+@click.group(
+    cls=DefaultCommandGroup,
+    help="Export the frames of a clip (the default command) or write thumbnails. Use COMMAND --help for more info.",
+)
+@click.version_option()
+def cli():
+    pass
+
+
+@cli.command(help="Show the frames of a clip or write them to OUT_PATH")
 @click.option("--file-format", default=".png", type=click.Choice([".png", ".jpg", ".tif"]))
 @click.option("--start-frame", default=1, type=click.INT)
 @click.option("--count", default=None, type=click.INT)
+@click.option(
+    "--npy",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the decoded frames to this .npy file as a (count, height, width) stack.",
+)
+@click.option("--profile", is_flag=True, help="Print the time spent in each processing stage.")
 @click.argument("cine_file", type=click.Path(exists=True, readable=True, dir_okay=False, file_okay=True))
 @click.argument("out_path", required=False, type=click.Path(exists=True, dir_okay=True, file_okay=False))
-@click.version_option()
-def cli(
+def export(
     file_format: str,
     start_frame: int,
     count: int,
+    npy: str,
+    profile: bool,
     out_path: str,
     cine_file: str,
 ):
+    import cv2
+
+    if profile:
+        profiling.enable()
+
+    if npy:
+        stack = export_npy(cine_file, npy, start_frame=start_frame, count=count)
+        click.echo(f"Wrote {stack.shape[0]} frames of {stack.shape[2]}x{stack.shape[1]} {stack.dtype} to {npy}")
+        if profile:
+            click.echo(profiling.report(), err=True)
+        return
+
     raw_images, setup, bpp = read_frames(cine_file, start_frame=start_frame, count=count)
 
     if setup.CFA in [3, 4]:
@@ -58,12 +101,73 @@ def cli(
             out_name = f"{name}-{frame_number:06d}.{ending}"
             out_file = os.path.join(out_path, out_name)
             print(f"Writing File {out_file}")
-            interpolated = np.interp(rgb_image, [0, 2 ** bpp - 1], [0, 2 ** 16 - 1]).astype(np.uint16)
-            cv2.imwrite(out_file, interpolated)
+            with profiling.stage("scale", rgb_image.nbytes):
+                interpolated = np.interp(rgb_image, [0, 2 ** bpp - 1], [0, 2 ** 16 - 1]).astype(np.uint16)
+            with profiling.stage("write", interpolated.nbytes):
+                cv2.imwrite(out_file, interpolated)
 
         else:
             display(resize(rgb_image, 720))
 
+    if profile:
+        click.echo(profiling.report(), err=True)
+
+
+def find_clips(directory: str):
+    for path, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(".cine"):
+                yield os.path.join(path, name)
+
+
+@cli.command(
+    help="Write a thumbnail of the middle frame of every clip below DIRECTORY to OUT_PATH (DIRECTORY by default)"
+)
+@click.option("--width", default=320, type=click.IntRange(min=1), show_default=True, help="Width of the thumbnails.")
+@click.option("--file-format", default=".jpg", type=click.Choice([".png", ".jpg", ".tif"]), show_default=True)
+@click.option("--workers", default=8, type=click.IntRange(min=1), help="Number of clips processed in parallel.")
+@click.option("--profile", is_flag=True, help="Print the time spent in each processing stage.")
+@click.argument("directory", type=click.Path(exists=True, readable=True, dir_okay=True, file_okay=False))
+@click.argument("out_path", required=False, type=click.Path(dir_okay=True, file_okay=False))
+def thumbs(width: int, file_format: str, workers: int, profile: bool, directory: str, out_path: str):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import cv2
+
+    from pycine.thumbnail import clip_thumbnail
+
+    if profile:
+        profiling.enable()
+    if not out_path:
+        out_path = directory
+
+    def write_thumbnail(cine_file):
+        out_name = os.path.splitext(os.path.relpath(cine_file, directory))[0] + file_format
+        out_file = os.path.join(out_path, out_name)
+        try:
+            image = clip_thumbnail(cine_file, width)
+            os.makedirs(os.path.dirname(out_file), exist_ok=True)
+            with profiling.stage("write", image.nbytes):
+                cv2.imwrite(out_file, image)
+        except Exception as e:
+            return e
+        return out_file
+
+    failed = False
+    with ThreadPoolExecutor(workers) as executor:
+        clips = list(find_clips(directory))
+        for cine_file, result in zip(clips, executor.map(write_thumbnail, clips)):
+            if isinstance(result, Exception):
+                click.secho(f"{cine_file}: could not be read: {result}", fg="red")
+                failed = True
+            else:
+                click.echo(f"Writing File {result}")
+
+    if profile:
+        click.echo(profiling.report(), err=True)
+    if failed:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+import click
+
+from pycine.server import FrameServer
+
+
+@click.command(help="Serve the headers and frames of all clips in DIRECTORY over HTTP. See pycine.server for routes.")
+@click.option("--host", default="127.0.0.1", help="Address to listen on.")
+@click.option("--port", default=8000, type=click.IntRange(0, 65535), help="Port to listen on.")
+@click.option("--cache-size", default=512, type=click.IntRange(min=0), help="Decoded frame cache size in MiB.")
+@click.argument("directory", type=click.Path(exists=True, readable=True, dir_okay=True, file_okay=False))
+@click.version_option()
+def cli(host, port, cache_size, directory):
+    with FrameServer((host, port), directory, cache_size * 2 ** 20) as server:
+        click.echo(f"Serving {directory} on http://{host}:{server.server_address[1]}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,8 +1,25 @@
-import cv2
+from functools import lru_cache
+
 import numpy as np
 
+from pycine.profiling import profiled, stage
+
+# cv2 is imported by the functions that use it, importing it takes longer than all of pycine
+
+BAYER_PATTERNS = {3: "gbrg", 4: "rggb"}
+# Names of the cv2 color conversion codes
+BAYER_TO_BGR = {3: "COLOR_BAYER_GR2BGR", 4: "COLOR_BAYER_BG2BGR"}
+
+
+@profiled("color_pipeline")
+def color_pipeline(raw, setup, bpp=12, dtype=np.uint16):
+    """
+    Debayer and color correct a uint16 raw image into an RGB image of `dtype`
+
+    uint16 output spans `[0, 2**bpp - 1]`, uint8 `[0, 255]` and float32 `[0, 1]`.
+    """
+    import cv2
 
-def color_pipeline(raw, setup, bpp=12):
     print(
         "WARNING: The color pipeline implementation is incomplete "
         "and will most likely not output the colors you expect!"
@@ -16,12 +33,13 @@ def color_pipeline(raw, setup, bpp=12):
 
     # 2. White balance the raw picture using the white balance component of cmatrix
     white_balance, color_matrix = decompose_cmatrix(np.asarray(setup.cmCalib).reshape((3, 3)))
-    BayerPatterns = {3: "gbrg", 4: "rggb"}
-    pattern = BayerPatterns[setup.CFA]
-    raw = whitebalance_raw(raw.astype(np.float32), white_balance, pattern).astype(np.uint16)
+    pattern = BAYER_PATTERNS[setup.CFA]
+    with stage("white_balance", raw.nbytes):
+        raw = whitebalance_raw(raw.astype(np.float32), white_balance, pattern).astype(np.uint16)
 
     # 3. Debayer the image
-    rgb_image = cv2.cvtColor(raw, cv2.COLOR_BAYER_GB2RGB)
+    with stage("debayer", raw.nbytes):
+        rgb_image = cv2.cvtColor(raw, cv2.COLOR_BAYER_GB2RGB)
 
     # convert to float
     rgb_image = rgb_image.astype(np.float32) / (2 ** bpp - 1)
@@ -45,7 +63,8 @@ def color_pipeline(raw, setup, bpp=12):
 
     # 9. Apply the gamma curves; the green channel uses gamma, red uses gamma + rgamma and blue uses gamma + bgamma
     print("fGamma, fGammaR, fGammaB: ", setup.fGamma, setup.fGammaR, setup.fGammaB)
-    rgb_image = apply_gamma(rgb_image, setup)
+    with stage("gamma", rgb_image.nbytes):
+        rgb_image = apply_gamma(rgb_image, setup)
 
     # 10. Apply the tone curve to each of the red, green, blue channels
     fTone = np.asarray(setup.fTone)
@@ -62,7 +81,71 @@ def color_pipeline(raw, setup, bpp=12):
     # 14. Rotate the Cr and Cb components around the origin in the CrCb plane by hue degrees.
     print("fHue: ", setup.fHue)
 
-    return (rgb_image * (2 ** bpp - 1)).astype(np.uint16)
+    # The float image is scaled and converted in one pass (float32 is returned as is)
+    dtype = np.dtype(dtype)
+    if dtype == np.float32:
+        return rgb_image
+    if dtype == np.uint8:
+        rgb_image *= 255
+        rgb_image += 0.5
+        np.clip(rgb_image, 0, 255, out=rgb_image)
+    elif dtype == np.uint16:
+        rgb_image *= 2 ** bpp - 1
+    else:
+        raise ValueError("Only uint8, uint16 and float32 images are supported")
+    return rgb_image.astype(dtype)
+
+
+@lru_cache(maxsize=32)
+def preview_lut(bpp: int, gain: float = 1.0, gamma: float = 2.2) -> np.ndarray:
+    """
+    Get a LUT that maps `bpp` bit values to gained and gamma corrected 8bit values
+    """
+    x = np.arange(2 ** bpp, dtype=np.float32) * np.float32(gain / (2 ** bpp - 1))
+    lut = (np.clip(x, 0, 1) ** np.float32(1 / gamma) * 255 + 0.5).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+def white_balance_gains(setup) -> dict:
+    """
+    Get the red, green and blue gains of the white balance component of cmCalib, relative to green
+    """
+    white_balance, _ = decompose_cmatrix(np.asarray(setup.cmCalib).reshape((3, 3)))
+    white_balance = white_balance.diagonal()
+    return {"r": white_balance[0] / white_balance[1], "g": 1.0, "b": white_balance[2] / white_balance[1]}
+
+
+@profiled("preview")
+def preview_8bit(raw, setup, bpp=12, width=None):
+    """
+    Fast 8bit BGR preview of a raw image
+
+    White balance, gamma and the conversion to 8bit are done with one LUT per CFA site before debayering, so there is
+    no float pass over the full image. Like `color_pipeline` this is not a color accurate rendering.
+    """
+    import cv2
+
+    out = np.empty(raw.shape, dtype=np.uint8)
+
+    if setup.CFA in BAYER_PATTERNS:
+        gains = white_balance_gains(setup)
+        pattern = BAYER_PATTERNS[setup.CFA]
+        for color, (y, x) in zip(pattern, [(0, 0), (0, 1), (1, 0), (1, 1)]):
+            np.take(preview_lut(bpp, float(gains[color])), raw[y::2, x::2], out=out[y::2, x::2], mode="clip")
+        image = cv2.cvtColor(out, getattr(cv2, BAYER_TO_BGR[setup.CFA]))
+
+    elif setup.CFA == 0:
+        np.take(preview_lut(bpp), raw, out=out, mode="clip")
+        image = cv2.cvtColor(out, cv2.COLOR_GRAY2BGR)
+
+    else:
+        raise ValueError("Sensor not supported")
+
+    if width:
+        image = resize(image, width)
+
+    return image
 
 
 def gen_mask(pattern, c, image):
@@ -105,6 +188,8 @@ def apply_gamma(rgb_image, setup):
 
 
 def resize(rgb_image, new_width):
+    import cv2
+
     height, width = rgb_image.shape[:2]
     new_height = int(new_width * (float(height) / width))
     res = cv2.resize(rgb_image, (new_width, new_height))
@@ -0,0 +1,113 @@
+import os
+from os import PathLike
+from typing import Iterable, Tuple, Union
+
+import numpy as np
+
+from pycine.cache import FrameCache
+from pycine.raw import Roi, crop_roi
+from pycine.reader import CineReader
+
+
+class CineDataset:
+    """
+    Random access to samples of consecutive frames from many clips, e.g. for training with shuffled batches
+
+    Every clip's header is read once when the dataset is created and all samples are numbered by one global index, so
+    `dataset[i]` only reads the frames of sample `i`. Samples never span two clips. The dataset can be pickled and
+    used from worker processes (e.g. a PyTorch `DataLoader` with `num_workers`): every process opens the clips lazily
+    and keeps its own bounded cache of cropped, decoded frames, which overlapping samples share.
+
+    A sample is a new `(frames_per_sample, height, width)` array.
+
+    Parameters
+    ----------
+    paths : iterable
+        Paths to the cine files
+    frames_per_sample : int
+        Number of consecutive frames in a sample
+    roi : tuple
+        Region of interest as (top, bottom, left, right), the full frame if None
+    dtype : numpy dtype
+        uint8, uint16 or float32 (see `pycine.raw.create_raw_array`)
+    normalize : bool
+        If False, get the unpacked sensor values. `dtype` must be None then.
+    cache_bytes : int
+        Upper bound of each process' frame cache
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Union[str, bytes, PathLike]],
+        frames_per_sample: int = 1,
+        roi: Roi = None,
+        dtype: np.dtype = np.float32,
+        normalize: bool = True,
+        cache_bytes: int = 256 * 2 ** 20,
+    ):
+        if frames_per_sample < 1:
+            raise ValueError("A sample needs at least one frame")
+        self.readers = [CineReader(path) for path in paths]
+        self.frames_per_sample = frames_per_sample
+        self.roi = roi
+        self.dtype = dtype
+        self.normalize = normalize
+        self.cache_bytes = cache_bytes
+
+        counts = [max(len(reader) - frames_per_sample + 1, 0) for reader in self.readers]
+        self.starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._cache = None
+        self._cache_pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_cache"] = state["_cache_pid"] = None
+        return state
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Sample index {index} out of range")
+
+        reader, first_frame = self.locate(index)
+        frame_indices = range(first_frame, first_frame + self.frames_per_sample)
+        return np.stack([self.frame(reader, frame_index) for frame_index in frame_indices])
+
+    @property
+    def cache(self) -> FrameCache:
+        # A forked worker must not share the parent's cache and its lock
+        if self._cache_pid != os.getpid():
+            self._cache = FrameCache(self.cache_bytes)
+            self._cache_pid = os.getpid()
+        return self._cache
+
+    @property
+    def paths(self):
+        return [reader.cine_file for reader in self.readers]
+
+    def locate(self, index: int) -> Tuple[CineReader, int]:
+        """
+        Get the reader of a sample's clip and the zero based index of the sample's first frame in that clip
+        """
+        clip = int(np.searchsorted(self.starts, index, side="right")) - 1
+        return self.readers[clip], index - int(self.starts[clip])
+
+    def frame(self, reader: CineReader, frame_index: int) -> np.ndarray:
+        """
+        Get the cropped frame of a clip from the cache or decode it
+        """
+        key = self.cache.key(reader.clip_id, frame_index, roi=self.roi, normalize=self.normalize, dtype=self.dtype)
+        raw_image = self.cache.get(key)
+        if raw_image is None:
+            raw_image = crop_roi(reader.get(frame_index, self.normalize, self.dtype), self.roi)
+            # Only keep the region of interest in memory, not the whole frame
+            raw_image = self.cache.put(key, np.ascontiguousarray(raw_image))
+        return raw_image
+
+    def close(self):
+        for reader in self.readers:
+            reader.close()
@@ -0,0 +1,108 @@
+import importlib
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pycine.file import Header
+
+logger = logging.getLogger()
+
+# Called as decoder(data, header, normalize, dtype), see `pycine.raw.create_raw_array`. Decoders that support calibrated
+# frames are called with an additional `calibration=` keyword argument.
+Decoder = Callable[[bytes, Header, bool, Optional[np.dtype]], np.ndarray]
+# (biCompression, biBitCount, CFA), None matches any value
+DecoderKey = Tuple[int, Optional[int], Optional[int]]
+
+# Backends that are only available if their dependencies are installed, imported on first use
+OPTIONAL_BACKENDS = {"numba": "pycine.numba_decode"}
+
+_decoders: Dict[str, Dict[DecoderKey, Decoder]] = {}
+_preference = ["numba", "numpy"]
+_optional_loaded = False
+
+
+def register_decoder(backend: str, compression: int, bit_count: int = None, cfa: int = None):
+    """
+    Decorator that registers a decoder of `backend` for frames with the given compression, bit depth and CFA
+
+    A `bit_count` or `cfa` of None registers the decoder for any value. The most specific registration wins.
+    """
+
+    def register(decoder: Decoder) -> Decoder:
+        _decoders.setdefault(backend, {})[(compression, bit_count, cfa)] = decoder
+        return decoder
+
+    return register
+
+
+def _load_optional_backends():
+    global _optional_loaded
+    if _optional_loaded:
+        return
+    _optional_loaded = True
+    for backend, module in OPTIONAL_BACKENDS.items():
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.debug(f"Decode backend {backend} is not available: {e}")
+
+
+def available_backends() -> List[str]:
+    """
+    Get the names of all registered backends in order of preference
+    """
+    _load_optional_backends()
+    return [backend for backend in _preference if backend in _decoders] + sorted(
+        backend for backend in _decoders if backend not in _preference
+    )
+
+
+def set_backend_preference(*backends: str):
+    """
+    Set the order in which backends are tried, e.g. `set_backend_preference("numpy")` to only use the reference code
+    """
+    _load_optional_backends()
+    for backend in backends:
+        if backend not in _decoders and backend not in OPTIONAL_BACKENDS:
+            raise ValueError(f"Unknown decode backend {backend}")
+    _preference[:] = backends
+
+
+def get_decoder(header: Header, backend: str = None) -> Decoder:
+    """
+    Get the decoder for the frames of a clip
+
+    Parameters
+    ----------
+    header : dict
+        A dictionary contains header information of the cine file
+    backend : str
+        Only use this backend. By default the first backend (see `set_backend_preference`) that supports the clip is
+        used, falling back to the numpy reference backend.
+    """
+    _load_optional_backends()
+    compression = header["bitmapinfoheader"].biCompression
+    bit_count = header["bitmapinfoheader"].biBitCount
+    cfa = header["setup"].CFA
+    keys = [
+        (compression, bit_count, cfa),
+        (compression, bit_count, None),
+        (compression, None, cfa),
+        (compression, None, None),
+    ]
+
+    if backend is not None:
+        if backend not in _decoders:
+            raise ValueError(f"Decode backend {backend} is not available")
+        backends = [backend]
+    else:
+        backends = _preference + ["numpy"]
+
+    for name in backends:
+        decoders = _decoders.get(name, {})
+        for key in keys:
+            if key in decoders:
+                return decoders[key]
+
+    raise ValueError("biCompression is invalid")
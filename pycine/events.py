@@ -0,0 +1,139 @@
+import logging
+from os import PathLike
+from typing import BinaryIO, List, Tuple, Union
+
+import numpy as np
+
+from pycine.file import read_header, Header
+from pycine.profiling import profiled
+from pycine.raw import Roi, create_raw_array, crop_roi, read_bpp, read_image_data, unpack_sampled
+
+logger = logging.getLogger()
+
+FrameRange = Tuple[int, int]
+
+
+def read_sample(f: BinaryIO, header: Header, frame_index: int, roi: Roi = None, downsample: int = 1) -> np.ndarray:
+    """
+    Read a single frame as float32 in `[0, 1]`, cropped to `roi` and keeping only every `downsample`-th row and column
+
+    The unpacked sensor values are used directly because the normalization does not change where motion happens. Only
+    the sampled pixels are unpacked, so a downsampled sample costs a fraction of a full frame decode.
+    """
+    data = read_image_data(f, header, frame_index)
+    if downsample == 1:
+        raw_image = crop_roi(create_raw_array(data, header, normalize=False), roi)
+    else:
+        width, height = header["bitmapinfoheader"].biWidth, header["bitmapinfoheader"].biHeight
+        top, bottom, left, right = roi if roi is not None else (0, height, 0, width)
+        rows = np.arange(height)[top:bottom:downsample]
+        columns = np.arange(width)[left:right:downsample]
+        raw_image = unpack_sampled(data, header, rows, columns)
+    return raw_image.astype(np.float32) * np.float32(1 / (2 ** read_bpp(header, normalize=False) - 1))
+
+
+@profiled("difference")
+def difference_energy(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Mean squared difference between two images
+    """
+    difference = (b - a).ravel()
+    return float(np.dot(difference, difference)) / difference.size
+
+
+def merge_ranges(ranges: List[FrameRange]) -> List[FrameRange]:
+    """
+    Merge overlapping or touching (first, last) ranges
+    """
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(last, merged[-1][1]))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def find_events(
+    cine_file: Union[str, bytes, PathLike],
+    threshold: float = 1e-3,
+    stride: int = 8,
+    roi: Roi = None,
+    downsample: int = 4,
+    start_frame: int = 1,
+    count: int = None,
+    refine: bool = True,
+) -> List[FrameRange]:
+    """
+    Find ranges of frames with motion or other sudden changes
+
+    A coarse pass compares every `stride`-th frame at `downsample` resolution. Only the frames between coarse hits are
+    then decoded at full resolution and compared frame by frame. If a change is too gradual to exceed the threshold
+    between neighbouring frames, the coarse range is returned. Events shorter than `stride` frames that start and end
+    between two coarse samples are not detected.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    threshold : float
+        Minimum mean squared difference between compared frames with values normalized to `[0, 1]`
+    stride : int
+        Distance between the frames compared in the coarse pass
+    roi : tuple
+        Only look at the region (top, bottom, left, right)
+    downsample : int
+        Only use every n-th row and column in the coarse pass
+    start_frame : int
+        First frame to look at (1 based like `frame_reader`)
+    count : int
+        maximum number of frames to look at.
+    refine : bool
+        If False, skip the full resolution pass and return the coarse ranges
+
+    Returns
+    -------
+    ranges : list
+        Inclusive (first, last) frame numbers (1 based like `start_frame`) of the candidate events
+    """
+    header = read_header(cine_file)
+    image_count = header["cinefileheader"].ImageCount
+    if not 1 <= start_frame <= image_count:
+        raise ValueError(f"Cannot start at frame {start_frame}, the clip has frames 1 to {image_count}")
+    if count is not None and count < 0:
+        raise ValueError("count must not be negative")
+    if not count or start_frame - 1 + count > image_count:
+        count = image_count - start_frame + 1
+
+    first_index = start_frame - 1
+    last_index = first_index + count - 1
+    coarse = list(range(first_index, last_index + 1, stride))
+    if coarse[-1] != last_index:
+        coarse.append(last_index)
+
+    with open(cine_file, "rb") as f:
+        hits = []
+        previous = read_sample(f, header, coarse[0], roi, downsample)
+        for a, b in zip(coarse, coarse[1:]):
+            current = read_sample(f, header, b, roi, downsample)
+            if difference_energy(previous, current) > threshold:
+                hits.append((a, b))
+            previous = current
+
+        candidates = merge_ranges(hits)
+        logger.debug(f"Coarse pass found {len(candidates)} candidate ranges")
+        if not refine:
+            return [(a + 1, b + 1) for a, b in candidates]
+
+        events = []
+        for a, b in candidates:
+            changes = []
+            previous = read_sample(f, header, a, roi)
+            for frame_index in range(a + 1, b + 1):
+                current = read_sample(f, header, frame_index, roi)
+                if difference_energy(previous, current) > threshold:
+                    changes.append((frame_index - 1, frame_index))
+                previous = current
+            events.extend(merge_ranges(changes) or [(a, b)])
+
+    return [(a + 1, b + 1) for a, b in merge_ranges(events)]
@@ -0,0 +1,129 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from pycine.file import Header
+from pycine.profiling import stage
+from pycine.raw import Roi, crop_roi
+from pycine.reader import CineReader
+
+logger = logging.getLogger()
+
+
+def frame_dtype(header: Header, normalize: bool = True, dtype: np.dtype = None) -> np.dtype:
+    """
+    Get the type of the frames `create_raw_array` returns for a clip
+    """
+    if normalize:
+        return np.dtype(dtype or np.uint16)
+    if header["bitmapinfoheader"].biCompression == 0 and header["bitmapinfoheader"].biBitCount == 8:
+        return np.dtype(np.uint8)
+    return np.dtype(np.uint16)
+
+
+def frame_shape(header: Header, roi: Roi = None) -> Tuple[int, int]:
+    """
+    Get the `(height, width)` of the frames of a clip after cropping them to `roi`
+    """
+    height, width = header["bitmapinfoheader"].biHeight, header["bitmapinfoheader"].biWidth
+    top, bottom, left, right = roi if roi is not None else (0, height, 0, width)
+    return len(range(height)[top:bottom]), len(range(width)[left:right])
+
+
+def _export_chunk(
+    reader: CineReader, out: np.ndarray, positions: List[int], frame_indices: List[int], normalize, dtype, roi
+):
+    for position, frame_index in zip(positions, frame_indices):
+        raw_image = crop_roi(reader.get(frame_index, normalize, dtype), roi)
+        with stage("write", raw_image.nbytes):
+            out[position] = raw_image
+
+
+def export_npy(
+    cine_file: Union[str, bytes, PathLike],
+    npy_file: Union[str, bytes, PathLike],
+    start_frame: int = 1,
+    count: int = None,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+    roi: Roi = None,
+    workers: int = None,
+    chunk: int = 16,
+) -> np.memmap:
+    """
+    Write the decoded frames of a clip to a `(count, height, width)` .npy file
+
+    The .npy header is written first and the frames are decoded straight into a memory map of the file, so any tool
+    can later load the stack with `np.load(npy_file, mmap_mode="r")` instead of decoding the clip again. Chunks of
+    `chunk` consecutive frames are decoded by a pool of threads. At most two chunks per worker are in flight and the
+    map is flushed after every chunk, so memory use does not grow with the length of the clip.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    npy_file : str or file-like object
+        Path of the .npy file. An existing file is overwritten.
+    start_frame : int
+        First frame to export (1 based like `frame_reader`)
+    count : int
+        Number of frames to export. Defaults to all frames from `start_frame` on.
+    normalize : bool
+        If False, export the unpacked sensor values (see `create_raw_array`)
+    dtype : numpy dtype
+        uint8, uint16 (default) or float32 for normalized frames (see `create_raw_array`)
+    roi : tuple
+        Region of interest as (top, bottom, left, right), the full frame if None
+    workers : int
+        Number of decoding threads. Defaults to the number of CPUs.
+    chunk : int
+        Number of frames a worker decodes per task
+
+    Returns
+    -------
+    stack : np.memmap
+        A read-only memory map of the written stack
+    """
+    if not normalize and dtype is not None:
+        raise ValueError("dtype can only be chosen for normalized frames")
+
+    with CineReader(cine_file) as reader:
+        if not count:
+            count = len(reader) - start_frame + 1
+        if start_frame < 1 or count < 0 or start_frame - 1 + count > len(reader):
+            raise ValueError(
+                f"Cannot export {count} frames from frame {start_frame}, the clip has {len(reader)} frames"
+            )
+        if not workers:
+            workers = os.cpu_count() or 1
+
+        shape = (count,) + frame_shape(reader.header, roi)
+        out = np.lib.format.open_memmap(
+            npy_file, mode="w+", dtype=frame_dtype(reader.header, normalize, dtype), shape=shape
+        )
+        try:
+            with ThreadPoolExecutor(workers) as executor:
+                pending = deque()
+                for position in range(0, count, chunk):
+                    positions = list(range(position, min(position + chunk, count)))
+                    frame_indices = [start_frame - 1 + p for p in positions]
+                    logger.debug(f"Exporting frames {frame_indices[0] + 1} to {frame_indices[-1] + 1}")
+                    pending.append(
+                        executor.submit(_export_chunk, reader, out, positions, frame_indices, normalize, dtype, roi)
+                    )
+                    if len(pending) >= 2 * workers:
+                        pending.popleft().result()
+                        out.flush()
+
+                while pending:
+                    pending.popleft().result()
+            out.flush()
+        finally:
+            del out
+
+    return np.load(npy_file, mmap_mode="r")
@@ -1,27 +1,27 @@
 import ctypes as ct
-import datetime
 import os
 import struct
-from contextlib import contextmanager
 from io import BufferedIOBase, RawIOBase, BufferedReader
-from typing import Dict, Union, TypedDict, List, BinaryIO
+from typing import Dict, Union, List, BinaryIO
 
 import numpy as np
 
 from pycine import cine
 from pycine.cine import CINEFILEHEADER, BITMAPINFOHEADER, SETUP
+# The metadata functions live in pycine.metadata so pfs_meta does not import numpy, they remain importable from here
+from pycine.metadata import MetadataHeader, backup_header, open_ignoring_read_only, read_metadata, write_header
 
 
-class Header(TypedDict):
-    cinefileheader: cine.CINEFILEHEADER
-    bitmapinfoheader: cine.BITMAPINFOHEADER
-    setup: cine.SETUP
+class Header(MetadataHeader):
     pImage: List[int]
     timestamp: np.ndarray
     exposuretime: np.ndarray
 
 
 def read_header(cine_file: Union[str, bytes, os.PathLike]) -> Header:
+    """
+    Read the header of a cine file, see `pycine.metadata.read_metadata` to only read the metadata structures
+    """
     with open(cine_file, "rb") as f:
         header: Header = {
             "cinefileheader": cine.CINEFILEHEADER(),
@@ -49,6 +49,165 @@ def read_header(cine_file: Union[str, bytes, os.PathLike]) -> Header:
     return header
 
 
+def read_partial_header(cine_file: Union[str, bytes, os.PathLike]) -> Header:
+    """
+    Like `read_header` but tolerate a truncated image offset table. `pImage` only holds the entries that are present.
+    """
+    with open(cine_file, "rb") as f:
+        header: Header = {
+            "cinefileheader": cine.CINEFILEHEADER(),
+            "bitmapinfoheader": cine.BITMAPINFOHEADER(),
+            "setup": cine.SETUP(),
+            "pImage": [],
+            "timestamp": np.empty(0),
+            "exposuretime": np.empty(0),
+        }
+        if f.readinto(header["cinefileheader"]) < ct.sizeof(header["cinefileheader"]):
+            raise ValueError(f"{cine_file} is too short to be a cine file")
+        f.readinto(header["bitmapinfoheader"])
+        f.seek(header["cinefileheader"].OffSetup)
+        f.readinto(header["setup"])
+
+        f.seek(header["cinefileheader"].OffImageOffsets)
+        table = f.read(header["cinefileheader"].ImageCount * 8)
+        header["pImage"] = struct.unpack(f"{len(table) // 8}q", table[: len(table) // 8 * 8])
+
+        try:
+            header = read_tagged_block(f, header)
+        except (ValueError, IndexError):
+            pass
+
+    return header
+
+
+def image_size(header: Header) -> int:
+    """
+    Get the size of the image data of a frame as stored in the file
+    """
+    if header["bitmapinfoheader"].biSizeImage:
+        return header["bitmapinfoheader"].biSizeImage
+    bits = {256: 10, 1024: 12}.get(header["bitmapinfoheader"].biCompression, header["bitmapinfoheader"].biBitCount)
+    return header["bitmapinfoheader"].biWidth * abs(header["bitmapinfoheader"].biHeight) * bits // 8
+
+
+def check_image_offsets(header: Header, file_size: int) -> np.ndarray:
+    """
+    Check all image offsets of a header at once
+
+    A frame passes if it starts after the image offset table and its smallest possible annotation and image data end
+    within the file. This is a pre-filter, `check_stored_sizes` also validates the actual annotation and image size.
+
+    Returns
+    -------
+    valid : np.ndarray
+        A boolean array with an entry per `pImage` entry
+    """
+    p_image = np.asarray(header["pImage"], dtype=np.int64)
+    table_end = header["cinefileheader"].OffImageOffsets + header["cinefileheader"].ImageCount * 8
+    return (p_image >= table_end) & (p_image + 8 + image_size(header) <= file_size)
+
+
+def check_stored_sizes(f: BinaryIO, header: Header, valid: np.ndarray, file_size: int) -> np.ndarray:
+    """
+    Invalidate frames whose stored annotation and image data reach past the end of the file
+
+    Frames do not overlap, so only the last valid frame in the file can be cut by the end of the file. Its stored
+    sizes are read, and the frame before it is checked as well if it turns out to be truncated.
+
+    Parameters
+    ----------
+    f : file-like object
+        The cine file opened in binary mode
+    header : dict
+        A header as returned by `read_partial_header`
+    valid : np.ndarray
+        The result of `check_image_offsets`, updated in place
+    file_size : int
+        Size of the cine file in bytes
+
+    Returns
+    -------
+    valid : np.ndarray
+        The updated `valid`
+    """
+    p_image = np.asarray(header["pImage"], dtype=np.int64)
+    while valid.any():
+        last = p_image[valid].max()
+        truncated = False
+        for frame_index in np.flatnonzero(valid & (p_image == last)):
+            f.seek(last)
+            annotation_size, image_size = struct.unpack("II", f.read(8))
+            if annotation_size != 8 and 8 <= annotation_size <= file_size - last:
+                f.seek(last + annotation_size - 4)
+                image_size = struct.unpack("I", f.read(4))[0]
+            if not 8 <= annotation_size <= file_size - last - image_size:
+                valid[frame_index] = False
+                truncated = True
+        if not truncated:
+            break
+    return valid
+
+
+def _valid_frames(cine_file: Union[str, bytes, os.PathLike], header: Header) -> np.ndarray:
+    file_size = os.path.getsize(cine_file)
+    valid = np.zeros(header["cinefileheader"].ImageCount, dtype=bool)
+    with open(cine_file, "rb") as f:
+        valid[: len(header["pImage"])] = check_stored_sizes(
+            f, header, check_image_offsets(header, file_size), file_size
+        )
+    return valid
+
+
+def check_frames(cine_file: Union[str, bytes, os.PathLike]) -> np.ndarray:
+    """
+    Validate the image offsets and sizes of a clip against its file size
+
+    Returns
+    -------
+    valid : np.ndarray
+        A boolean array of length `ImageCount`. Frames missing from a truncated offset table are invalid.
+    """
+    return _valid_frames(cine_file, read_partial_header(cine_file))
+
+
+def recover_header(cine_file: Union[str, bytes, os.PathLike]) -> Header:
+    """
+    Read the header of a damaged or truncated clip with an index over the surviving frames only
+
+    The returned header can be passed to `pycine.raw.frame_reader` or `pycine.reader.CineReader` to read the good
+    part of the clip. Do not write it back with `write_header`.
+    """
+    header = read_partial_header(cine_file)
+    image_count = header["cinefileheader"].ImageCount
+    valid = _valid_frames(cine_file, header)
+
+    header["pImage"] = tuple(np.asarray(header["pImage"], dtype=np.int64)[valid[: len(header["pImage"])]].tolist())
+    for key in ("timestamp", "exposuretime"):
+        if len(header[key]) == image_count:
+            header[key] = header[key][valid]
+    header["cinefileheader"].ImageCount = len(header["pImage"])
+
+    return header
+
+
+def header_to_dict(header: Header) -> dict:
+    """
+    Convert a header into plain python types, e.g. to serialize it as JSON
+    """
+    def convert(value):
+        if isinstance(value, ct.Structure):
+            return {field[0]: convert(getattr(value, field[0])) for field in value._fields_}
+        if isinstance(value, (ct.Array, tuple, list)):
+            return [convert(v) for v in value]
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, bytes):
+            return value.split(b"\0")[0].decode("latin-1")
+        return value
+
+    return {key: convert(value) for key, value in header.items()}
+
+
 def read_chd_header(chd_file: Union[str, bytes, os.PathLike]) -> Header:
     """
     read the .chd header file created when Vision Research software saves the images in a file format other than .cine
@@ -97,39 +256,3 @@ def read_tagged_block(f: BinaryIO, header: Header) -> Header:
         position += blocksize
 
     return header
-
-
-def write_header(
-    cine_file: Union[str, bytes, os.PathLike],
-    header: Header,
-    backup=True,
-):
-    if backup:
-        backup_header(cine_file)
-
-    with open_ignoring_read_only(cine_file, "rb+") as f:
-        f.write(header["cinefileheader"])
-        f.write(header["bitmapinfoheader"])
-        f.seek(header["cinefileheader"].OffSetup)
-        f.write(header["setup"])
-
-
-def backup_header(cine_file: Union[str, bytes, os.PathLike]):
-    now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    header = read_header(cine_file)
-    with open(str(cine_file) + f"_metadata_backup_{now}", "xb") as f:
-        f.write(header["cinefileheader"])
-        f.write(header["bitmapinfoheader"])
-        f.seek(header["cinefileheader"].OffSetup)
-        f.write(header["setup"])
-
-
-@contextmanager
-def open_ignoring_read_only(file_path: Union[str, bytes, os.PathLike], mode: str):
-    mode_before = os.stat(file_path).st_mode
-    os.chmod(file_path, 0o600)
-
-    with open(file_path, mode) as f:
-        yield f
-
-    os.chmod(file_path, mode_before)
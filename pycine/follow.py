@@ -0,0 +1,120 @@
+import ctypes as ct
+import logging
+import os
+import struct
+import time
+from os import PathLike
+from typing import Any, BinaryIO, Generator, Tuple, Union
+
+import numpy as np
+
+from pycine import cine
+from pycine.file import read_header, Header
+from pycine.raw import create_raw_array, read_bpp, read_image_data
+from pycine.stats import FrameStats, compute_frame_stats, empty_frame_stats, store_frame_stats
+
+logger = logging.getLogger()
+
+
+def wait_for_size(f: BinaryIO, size: int, poll_interval: float = 0.5, timeout: float = 30.0):
+    """
+    Block until the file has at least `size` bytes. Raise TimeoutError if it does not grow for `timeout` seconds.
+    """
+    last_size = -1
+    last_growth = time.monotonic()
+    while True:
+        current_size = os.fstat(f.fileno()).st_size
+        if current_size >= size:
+            return
+        if current_size != last_size:
+            last_size = current_size
+            last_growth = time.monotonic()
+        elif time.monotonic() - last_growth > timeout:
+            raise TimeoutError(f"File stopped growing at {current_size} bytes, waiting for {size} bytes")
+        time.sleep(poll_interval)
+
+
+def wait_for_header(
+    cine_file: Union[str, bytes, PathLike], poll_interval: float = 0.5, timeout: float = 30.0
+) -> Header:
+    """
+    Wait until the header and the image offset table of a growing cine file are present and read them
+    """
+    with open(cine_file, "rb") as f:
+        wait_for_size(f, ct.sizeof(cine.CINEFILEHEADER), poll_interval, timeout)
+        cinefileheader = cine.CINEFILEHEADER()
+        f.readinto(cinefileheader)
+        wait_for_size(f, cinefileheader.OffImageOffsets + cinefileheader.ImageCount * 8, poll_interval, timeout)
+
+    return read_header(cine_file)
+
+
+def follow_frames(
+    cine_file: Union[str, bytes, PathLike],
+    start_frame: int = 1,
+    normalize: bool = True,
+    poll_interval: float = 0.5,
+    timeout: float = 30.0,
+) -> Generator[Tuple[int, np.ndarray], Any, None]:
+    """
+    Get a generator of `(frame_number, raw_image)` for a cine file that is still being written or copied
+
+    Every frame is yielded as soon as its bytes are present, so processing can run alongside an offload. The file is
+    polled every `poll_interval` seconds. Copies that preallocate the full file size can not be followed.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    start_frame : int
+        First frame to read (1 based like `frame_reader`)
+    normalize : bool
+        If False, yield the unpacked sensor values
+    poll_interval : float
+        Seconds between checks of the file size
+    timeout : float
+        Raise TimeoutError if the file does not grow for this many seconds while frames are missing
+    """
+    header = wait_for_header(cine_file, poll_interval, timeout)
+
+    with open(cine_file, "rb") as f:
+        for frame_index in range(start_frame - 1, header["cinefileheader"].ImageCount):
+            pointer = header["pImage"][frame_index]
+            wait_for_size(f, pointer + 4, poll_interval, timeout)
+            f.seek(pointer)
+            annotation_size = struct.unpack("I", f.read(4))[0]
+
+            wait_for_size(f, pointer + annotation_size, poll_interval, timeout)
+            f.seek(pointer + annotation_size - 4)
+            image_size = struct.unpack("I", f.read(4))[0]
+
+            wait_for_size(f, pointer + annotation_size + image_size, poll_interval, timeout)
+            yield frame_index + 1, create_raw_array(read_image_data(f, header, frame_index), header, normalize)
+
+
+def follow_frame_stats(
+    cine_file: Union[str, bytes, PathLike],
+    bins: int = 256,
+    clip_level: int = None,
+    row_step: int = 1,
+    col_step: int = 1,
+    normalize: bool = True,
+    poll_interval: float = 0.5,
+    timeout: float = 30.0,
+) -> FrameStats:
+    """
+    Compute the statistics of `pycine.stats.frame_stats` while a cine file is being written or copied
+
+    Each frame is processed as soon as it is present, so the result is ready right after the last frame arrived.
+    """
+    header = wait_for_header(cine_file, poll_interval, timeout)
+    count = header["cinefileheader"].ImageCount
+    bpp = read_bpp(header, normalize)
+
+    stats = empty_frame_stats(1, count, bins)
+    for frame_number, raw_image in follow_frames(cine_file, 1, normalize, poll_interval, timeout):
+        result = compute_frame_stats(raw_image, bpp, bins, clip_level, row_step, col_step)
+        store_frame_stats(stats, frame_number - 1, result)
+        logger.debug(f"Frame {frame_number} of {count} processed")
+
+    return stats
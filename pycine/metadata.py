@@ -0,0 +1,72 @@
+"""
+Reading and writing the metadata structures of a cine file
+
+This module does not import numpy, so tools that only show or change metadata (pfs_meta) start quickly. Use
+`pycine.file.read_header` to read the image offsets, timestamps and exposure times as well.
+"""
+import datetime
+import os
+from contextlib import contextmanager
+from typing import TypedDict, Union
+
+from pycine import cine
+
+
+class MetadataHeader(TypedDict):
+    cinefileheader: cine.CINEFILEHEADER
+    bitmapinfoheader: cine.BITMAPINFOHEADER
+    setup: cine.SETUP
+
+
+def read_metadata(cine_file: Union[str, bytes, os.PathLike]) -> MetadataHeader:
+    """
+    Read the cinefileheader, bitmapinfoheader and setup of a cine file, all that `write_header` needs
+    """
+    with open(cine_file, "rb") as f:
+        header: MetadataHeader = {
+            "cinefileheader": cine.CINEFILEHEADER(),
+            "bitmapinfoheader": cine.BITMAPINFOHEADER(),
+            "setup": cine.SETUP(),
+        }
+        f.readinto(header["cinefileheader"])
+        f.readinto(header["bitmapinfoheader"])
+        f.seek(header["cinefileheader"].OffSetup)
+        f.readinto(header["setup"])
+
+    return header
+
+
+def write_header(
+    cine_file: Union[str, bytes, os.PathLike],
+    header: MetadataHeader,
+    backup=True,
+):
+    if backup:
+        backup_header(cine_file)
+
+    with open_ignoring_read_only(cine_file, "rb+") as f:
+        f.write(header["cinefileheader"])
+        f.write(header["bitmapinfoheader"])
+        f.seek(header["cinefileheader"].OffSetup)
+        f.write(header["setup"])
+
+
+def backup_header(cine_file: Union[str, bytes, os.PathLike]):
+    now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    header = read_metadata(cine_file)
+    with open(str(cine_file) + f"_metadata_backup_{now}", "xb") as f:
+        f.write(header["cinefileheader"])
+        f.write(header["bitmapinfoheader"])
+        f.seek(header["cinefileheader"].OffSetup)
+        f.write(header["setup"])
+
+
+@contextmanager
+def open_ignoring_read_only(file_path: Union[str, bytes, os.PathLike], mode: str):
+    mode_before = os.stat(file_path).st_mode
+    os.chmod(file_path, 0o600)
+
+    with open(file_path, mode) as f:
+        yield f
+
+    os.chmod(file_path, mode_before)
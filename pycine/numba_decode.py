@@ -0,0 +1,194 @@
+"""
+Decoders compiled with numba that unpack, normalize, calibrate and flip a frame in a single pass
+
+Importing this module registers the "numba" decode backend, `pycine.decode` does so automatically if numba is
+installed. The frames are identical to those of the numpy reference decoder.
+
+The kernels run on one thread and release the GIL, so frames are decoded concurrently by the thread pools of
+`parallel_frame_reader`, `CineSequence` or `AsyncCineReader`. numba's own parallel loops are not used because their
+default thread pool does not survive a fork, which would hang the worker processes of `pycine.parallel`.
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import numba
+import numpy as np
+
+from pycine.decode import register_decoder
+from pycine.raw import normalization_lut, unpack_raw_array
+
+if TYPE_CHECKING:
+    from pycine.calibration import Calibration
+
+
+@numba.njit(nogil=True, cache=True)
+def _decode_10bit(packed, lut, out):
+    flat = out.reshape(-1)
+    for i in range(flat.size // 4):
+        b0 = np.int64(packed[5 * i])
+        b1 = np.int64(packed[5 * i + 1])
+        b2 = np.int64(packed[5 * i + 2])
+        b3 = np.int64(packed[5 * i + 3])
+        b4 = np.int64(packed[5 * i + 4])
+        flat[4 * i] = lut[(b0 << 2) | (b1 >> 6)]
+        flat[4 * i + 1] = lut[((b1 & 0b00111111) << 4) | (b2 >> 4)]
+        flat[4 * i + 2] = lut[((b2 & 0b00001111) << 6) | (b3 >> 2)]
+        flat[4 * i + 3] = lut[((b3 & 0b00000011) << 8) | b4]
+
+
+@numba.njit(nogil=True, cache=True)
+def _decode_12bit(packed, lut, out):
+    flat = out.reshape(-1)
+    for i in range(flat.size // 2):
+        b0 = np.int64(packed[3 * i])
+        b1 = np.int64(packed[3 * i + 1])
+        b2 = np.int64(packed[3 * i + 2])
+        flat[2 * i] = lut[(b0 << 4) | (b1 >> 4)]
+        flat[2 * i + 1] = lut[((b1 & 0b00001111) << 8) | b2]
+
+
+@numba.njit(nogil=True, cache=True)
+def _decode_flipped(pixels, lut, out):
+    height = out.shape[0]
+    for y in range(height):
+        row = pixels[height - 1 - y]
+        for x in range(out.shape[1]):
+            out[y, x] = lut[row[x]]
+
+
+@numba.njit(nogil=True, cache=True, inline="always")
+def _calibrate(value, dark, gain, clip, max_value, rounding):
+    # The operations of Calibration.apply in the same order and precision, so the frames are identical
+    value = (value - dark) * gain
+    if clip:
+        value = min(max(value, np.float32(0)), max_value) + rounding
+    return value
+
+
+@numba.njit(nogil=True, cache=True)
+def _decode_10bit_calibrated(packed, lut, dark, gain, clip, max_value, rounding, out):
+    flat, dark, gain = out.reshape(-1), dark.reshape(-1), gain.reshape(-1)
+    for i in range(flat.size // 4):
+        b0 = np.int64(packed[5 * i])
+        b1 = np.int64(packed[5 * i + 1])
+        b2 = np.int64(packed[5 * i + 2])
+        b3 = np.int64(packed[5 * i + 3])
+        b4 = np.int64(packed[5 * i + 4])
+        codes = (
+            (b0 << 2) | (b1 >> 6),
+            ((b1 & 0b00111111) << 4) | (b2 >> 4),
+            ((b2 & 0b00001111) << 6) | (b3 >> 2),
+            ((b3 & 0b00000011) << 8) | b4,
+        )
+        for j in range(4):
+            k = 4 * i + j
+            flat[k] = _calibrate(lut[codes[j]], dark[k], gain[k], clip, max_value, rounding)
+
+
+@numba.njit(nogil=True, cache=True)
+def _decode_12bit_calibrated(packed, lut, dark, gain, clip, max_value, rounding, out):
+    flat, dark, gain = out.reshape(-1), dark.reshape(-1), gain.reshape(-1)
+    for i in range(flat.size // 2):
+        b0 = np.int64(packed[3 * i])
+        b1 = np.int64(packed[3 * i + 1])
+        b2 = np.int64(packed[3 * i + 2])
+        k = 2 * i
+        flat[k] = _calibrate(lut[(b0 << 4) | (b1 >> 4)], dark[k], gain[k], clip, max_value, rounding)
+        flat[k + 1] = _calibrate(
+            lut[((b1 & 0b00001111) << 8) | b2], dark[k + 1], gain[k + 1], clip, max_value, rounding
+        )
+
+
+@numba.njit(nogil=True, cache=True)
+def _decode_flipped_calibrated(pixels, lut, dark, gain, clip, max_value, rounding, out):
+    height = out.shape[0]
+    for y in range(height):
+        row = pixels[height - 1 - y]
+        for x in range(out.shape[1]):
+            out[y, x] = _calibrate(lut[row[x]], dark[y, x], gain[y, x], clip, max_value, rounding)
+
+
+@lru_cache(maxsize=None)
+def _identity_lut(bits: int) -> np.ndarray:
+    return np.arange(2 ** bits, dtype=np.uint16)
+
+
+def _check_size(data: bytes, header, bits: int):
+    # The kernels do not check bounds, a short buffer would be read past its end
+    expected = header["bitmapinfoheader"].biWidth * header["bitmapinfoheader"].biHeight * bits // 8
+    if len(data) < expected:
+        raise ValueError(f"Image data has {len(data)} bytes, a {bits}bit frame needs {expected}")
+
+
+def _frame_lut(header, normalize, dtype, bits):
+    if normalize:
+        return normalization_lut(header, dtype)
+    return _identity_lut(bits)
+
+
+def _decode_calibrated(kernel, pixels, header, dtype, calibration) -> np.ndarray:
+    dtype, max_value = calibration.output_range(header, dtype)
+    clip = dtype != np.float32
+    rounding = 0.5 if dtype == np.uint8 else 0.0
+    out = np.empty(calibration.shape, dtype=dtype)
+    kernel(
+        pixels,
+        normalization_lut(header, np.float32),
+        calibration.dark,
+        calibration.scaled_gain(max_value),
+        clip,
+        np.float32(max_value),
+        np.float32(rounding),
+        out,
+    )
+    return out
+
+
+@register_decoder("numba", 256)
+def decode_10bit(
+    data: bytes, header, normalize: bool = True, dtype: np.dtype = None, calibration: "Calibration" = None
+) -> np.ndarray:
+    _check_size(data, header, 10)
+    if calibration is not None:
+        return _decode_calibrated(
+            _decode_10bit_calibrated, np.frombuffer(data, dtype=np.uint8), header, dtype, calibration
+        )
+    lut = _frame_lut(header, normalize, dtype, 10)
+    out = np.empty((header["bitmapinfoheader"].biHeight, header["bitmapinfoheader"].biWidth), dtype=lut.dtype)
+    _decode_10bit(np.frombuffer(data, dtype=np.uint8), lut, out)
+    return out
+
+
+@register_decoder("numba", 1024)
+def decode_12bit(
+    data: bytes, header, normalize: bool = True, dtype: np.dtype = None, calibration: "Calibration" = None
+) -> np.ndarray:
+    _check_size(data, header, 12)
+    if calibration is not None:
+        return _decode_calibrated(
+            _decode_12bit_calibrated, np.frombuffer(data, dtype=np.uint8), header, dtype, calibration
+        )
+    lut = _frame_lut(header, normalize, dtype, 12)
+    out = np.empty((header["bitmapinfoheader"].biHeight, header["bitmapinfoheader"].biWidth), dtype=lut.dtype)
+    _decode_12bit(np.frombuffer(data, dtype=np.uint8), lut, out)
+    return out
+
+
+@register_decoder("numba", 0, 8)
+@register_decoder("numba", 0, 16)
+def decode_uncompressed(
+    data: bytes, header, normalize: bool = True, dtype: np.dtype = None, calibration: "Calibration" = None
+) -> np.ndarray:
+    if not normalize:
+        # Native counts are a zero-copy view, there is nothing to fuse
+        return unpack_raw_array(data, header)
+
+    width, height = header["bitmapinfoheader"].biWidth, header["bitmapinfoheader"].biHeight
+    pixels = np.frombuffer(data, dtype=np.uint16 if header["bitmapinfoheader"].biBitCount == 16 else np.uint8)
+    if calibration is not None:
+        return _decode_calibrated(_decode_flipped_calibrated, pixels.reshape(height, width), header, dtype, calibration)
+    lut = normalization_lut(header, dtype)
+    out = np.empty((height, width), dtype=lut.dtype)
+    _decode_flipped(pixels.reshape(height, width), lut, out)
+    return out
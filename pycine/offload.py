@@ -0,0 +1,264 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import Dict, List, Sequence, Tuple, Union
+
+from pycine.file import read_header
+from pycine.profiling import stage
+
+logger = logging.getLogger()
+
+ALIGNMENT = 2 ** 20
+
+
+def manifest_path(cine_file: Union[str, bytes, PathLike]) -> str:
+    return os.fsdecode(cine_file) + ".pfs_copy.json"
+
+
+def destination_path(source: Union[str, bytes, PathLike], destination: Union[str, bytes, PathLike]) -> str:
+    """
+    Get the path of the copy, a destination that is a directory gets the source's file name
+    """
+    if os.path.isdir(destination):
+        return os.path.join(os.fsdecode(destination), os.path.basename(os.fsdecode(source)))
+    return os.fsdecode(destination)
+
+
+def frame_ranges(cine_file: Union[str, bytes, PathLike]) -> List[Tuple[int, int]]:
+    """
+    Get the byte range `[start, end)` of every frame from the `pImage` index
+
+    A frame reaches up to the next frame in the file (the last one up to the end of the file), so its annotation and
+    any padding are included and no frame data has to be read.
+    """
+    p_image = read_header(cine_file)["pImage"]
+    starts = sorted(p_image)
+    ends = dict(zip(starts, starts[1:] + [os.path.getsize(cine_file)]))
+    return [(start, ends[start]) for start in p_image]
+
+
+class FrameHasher:
+    """
+    Hash frames from a stream of consecutive chunks of a file
+    """
+
+    def __init__(self, ranges: List[Tuple[int, int]], algorithm: str):
+        self.ranges = ranges
+        self.order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        self.hashes = [hashlib.new(algorithm) for _ in ranges]
+        self.next = 0
+
+    def update(self, offset: int, chunk: memoryview):
+        end = offset + len(chunk)
+        # Skip frames that ended before this chunk
+        while self.next < len(self.order) and self.ranges[self.order[self.next]][1] <= offset:
+            self.next += 1
+
+        for i in self.order[self.next :]:
+            start, stop = self.ranges[i]
+            if start >= end:
+                break
+            self.hashes[i].update(chunk[max(start, offset) - offset : min(stop, end) - offset])
+
+    def hexdigests(self) -> List[str]:
+        return [h.hexdigest() for h in self.hashes]
+
+
+def _resume_offset(destinations: Sequence[str], size: int) -> int:
+    offsets = []
+    for destination in destinations:
+        part = destination + ".part"
+        offsets.append(os.path.getsize(part) if os.path.exists(part) else 0)
+    return min(min(offsets), size) // ALIGNMENT * ALIGNMENT
+
+
+def _verified_offset(f, parts: Sequence[str], offset: int, buffers: List[bytearray], on_chunk) -> int:
+    """
+    Compare the first `offset` bytes of the `.part` files with the source `f` and get the length of the aligned prefix
+    that is identical in all of them
+
+    A crash can leave anything in a `.part` file, so only data that matches the source is kept. `on_chunk` is called
+    with every matching chunk of the source to rebuild the hash state.
+    """
+    import numpy as np
+
+    chunk_size = len(buffers[0])
+    position = 0
+    inputs = [open(part, "rb", buffering=0) for part in parts]
+    try:
+        while position < offset:
+            chunk = memoryview(buffers[0])[: min(chunk_size, offset - position)]
+            length = f.readinto(chunk)
+            if not length:
+                raise ValueError(f"{f.name} is shorter than the copies being resumed")
+            chunk = chunk[:length]
+
+            source_words = np.frombuffer(chunk, dtype=np.uint64)
+            for part in inputs:
+                copied = memoryview(buffers[1])[:length]
+                # Chunks are multiples of 1 MiB, so they can be compared as 64bit words
+                if part.readinto(copied) != length or not np.array_equal(
+                    np.frombuffer(copied, dtype=np.uint64), source_words
+                ):
+                    logger.warning(f"{part.name} differs from the source after byte {position}, resuming there")
+                    return position
+
+            on_chunk(position, chunk)
+            position += length
+    finally:
+        for part in inputs:
+            part.close()
+    return position
+
+
+def offload(
+    source: Union[str, bytes, PathLike],
+    destinations: Sequence[Union[str, bytes, PathLike]],
+    algorithm: str = "md5",
+    chunk_size: int = 64 * 2 ** 20,
+    resume: bool = True,
+    frame_hashes: bool = True,
+) -> Dict:
+    """
+    Copy a cine file to several destinations while hashing it, reading the source only once
+
+    The source is read in chunks (aligned to 1 MiB) into two alternating buffers. While the next chunk is read, the
+    current one is written to all destinations and hashed in parallel threads. Data is written to `<destination>.part`
+    which is renamed once the copy is complete. With `resume`, existing `.part` files are continued: the already copied
+    part is compared with the source, which is read to rebuild the hashes, and the copy continues after the longest
+    prefix that matches the source in every `.part` file.
+
+    A manifest with the file hash and per-frame hashes (see `frame_ranges`) is written next to every
+    destination as `<destination>.pfs_copy.json` and returned.
+
+    Parameters
+    ----------
+    source : str or file-like object
+        A string containing a path to a cine file
+    destinations : list
+        Paths of the copies. A destination that is a directory gets the source's file name.
+    algorithm : str
+        Any algorithm supported by `hashlib`
+    chunk_size : int
+        Bytes per read, rounded up to a multiple of 1 MiB
+    resume : bool
+        Continue from existing `.part` files
+    frame_hashes : bool
+        Also hash every frame
+    """
+    chunk_size = -(-chunk_size // ALIGNMENT) * ALIGNMENT
+    destinations = [destination_path(source, destination) for destination in destinations]
+    size = os.path.getsize(source)
+    ranges = frame_ranges(source) if frame_hashes else []
+    file_hash = hashlib.new(algorithm)
+    frame_hasher = FrameHasher(ranges, algorithm)
+
+    def hash_chunk(offset: int, chunk: memoryview):
+        with stage("hash", len(chunk)):
+            file_hash.update(chunk)
+            frame_hasher.update(offset, chunk)
+
+    def write_chunk(output, chunk: memoryview):
+        with stage("write", len(chunk)):
+            output.write(chunk)
+
+    offset = _resume_offset(destinations, size) if resume else 0
+
+    outputs = []
+    try:
+        buffers = [bytearray(chunk_size), bytearray(chunk_size)]
+        with open(source, "rb", buffering=0) as f, ThreadPoolExecutor(len(destinations) + 1) as executor:
+            # Check the part that was copied before against the source and rebuild its hash state
+            position = 0
+            if offset:
+                position = _verified_offset(f, [d + ".part" for d in destinations], offset, buffers, hash_chunk)
+                f.seek(position)
+                logger.info(f"Resuming {source} at byte {position}")
+
+            for destination in destinations:
+                part = destination + ".part"
+                output = open(part, "r+b" if position and os.path.exists(part) else "wb")
+                output.seek(position)
+                output.truncate()
+                outputs.append(output)
+
+            pending = []
+            current = 0
+            while True:
+                chunk = memoryview(buffers[current])
+                with stage("read") as read_stage:
+                    length = read_stage.nbytes = f.readinto(chunk)
+                # The other buffer may only be reused once all work on it is done
+                for future in pending:
+                    future.result()
+                if not length:
+                    break
+
+                chunk = chunk[:length]
+                pending = [executor.submit(write_chunk, output, chunk) for output in outputs]
+                pending.append(executor.submit(hash_chunk, position, chunk))
+                position += length
+                current = 1 - current
+    finally:
+        for output in outputs:
+            output.close()
+
+    if position != size:
+        raise ValueError(f"{source} changed while it was copied")
+
+    manifest = {
+        "file": os.path.basename(os.fsdecode(source)),
+        "size": size,
+        "algorithm": algorithm,
+        "hash": file_hash.hexdigest(),
+        "frames": [
+            {"start": start, "end": end, "hash": h} for (start, end), h in zip(ranges, frame_hasher.hexdigests())
+        ],
+    }
+    for destination in destinations:
+        os.replace(destination + ".part", destination)
+        with open(manifest_path(destination), "w") as f:
+            json.dump(manifest, f, indent=1)
+
+    return manifest
+
+
+def verify(cine_file: Union[str, bytes, PathLike], manifest: Dict = None) -> Tuple[bool, List[int]]:
+    """
+    Check a copy against its manifest (read from `<cine_file>.pfs_copy.json` if not given)
+
+    Returns
+    -------
+    intact : bool
+        True if the file hash and size match
+    bad_frames : list
+        Zero based indices of frames that do not match
+    """
+    if manifest is None:
+        with open(manifest_path(cine_file)) as f:
+            manifest = json.load(f)
+
+    ranges = [(frame["start"], frame["end"]) for frame in manifest["frames"]]
+    file_hash = hashlib.new(manifest["algorithm"])
+    frame_hasher = FrameHasher(ranges, manifest["algorithm"])
+
+    buffer = bytearray(ALIGNMENT * 16)
+    position = 0
+    with open(cine_file, "rb", buffering=0) as f:
+        while True:
+            length = f.readinto(buffer)
+            if not length:
+                break
+            chunk = memoryview(buffer)[:length]
+            file_hash.update(chunk)
+            frame_hasher.update(position, chunk)
+            position += length
+
+    bad_frames = [
+        i for i, (frame, h) in enumerate(zip(manifest["frames"], frame_hasher.hexdigests())) if frame["hash"] != h
+    ]
+    intact = file_hash.hexdigest() == manifest["hash"] and position == manifest["size"]
+    return intact, bad_frames
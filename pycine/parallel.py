@@ -0,0 +1,146 @@
+import functools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import PathLike
+from typing import Any, Callable, Dict, Generator, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from pycine.reader import CineReader
+from pycine.sequence import CineSequence
+
+logger = logging.getLogger()
+
+Source = Union[str, bytes, PathLike, Sequence[Union[str, bytes, PathLike]], CineReader, CineSequence]
+
+_reader = None
+
+
+def _init_worker(reader: Union[CineReader, CineSequence]):
+    global _reader
+    _reader = reader
+
+
+def _map_chunk(frame_indices: List[int], func: Callable[[np.ndarray], Any], reduce: Callable[[Any, Any], Any] = None):
+    results = [func(_reader.get(frame_index)) for frame_index in frame_indices]
+    if reduce is not None:
+        return functools.reduce(reduce, results)
+    return results
+
+
+def open_reader(source: Source) -> Union[CineReader, CineSequence]:
+    """
+    Open a path as `CineReader` and a list of paths as `CineSequence`. Open readers and sequences are returned as is.
+    """
+    if isinstance(source, (CineReader, CineSequence)):
+        return source
+    if isinstance(source, (list, tuple)):
+        return CineSequence(source)
+    return CineReader(source)
+
+
+def shard_frames(
+    reader: Union[CineReader, CineSequence], frames: Iterable[int] = None, chunk: int = 32
+) -> List[List[int]]:
+    """
+    Split frame indices into chunks of neighbouring frames in the file, so every worker reads mostly sequentially
+    """
+    if frames is None:
+        frames = range(len(reader))
+    ordered = sorted(frames, key=reader.file_position)
+    return [ordered[i : i + chunk] for i in range(0, len(ordered), chunk)]
+
+
+def _executor(reader: Union[CineReader, CineSequence], workers: int = None, mp_context=None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        workers or os.cpu_count(), mp_context=mp_context, initializer=_init_worker, initargs=(reader,)
+    )
+
+
+def map_frames(
+    cine_file: Source,
+    func: Callable[[np.ndarray], Any],
+    frames: Iterable[int] = None,
+    workers: int = None,
+    chunk: int = 32,
+    reduce: Callable[[Any, Any], Any] = None,
+    mp_context=None,
+) -> Union[List[Any], Any]:
+    """
+    Apply `func` to frames of a clip in worker processes
+
+    The header is read once and every worker opens the clip once. Frames are sharded into chunks of neighbouring frames
+    (by their `pImage` offset) and each chunk is read, decoded and processed by one worker. `func` (and `reduce`) must
+    be picklable for the spawn and forkserver start methods.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object or list or CineReader or CineSequence
+        A string containing a path to a cine file, a list of paths that form a `CineSequence` or an open reader
+    func : callable
+        Called with the raw image of each frame
+    frames : iterable
+        Zero based frame indices to process. Defaults to all frames.
+    workers : int
+        Number of worker processes. Defaults to the number of CPUs.
+    chunk : int
+        Number of frames a worker processes per task
+    reduce : callable
+        If given, the results are combined with this binary function in the order of `frames`, first within each chunk
+        in the worker and then across chunks. It must be associative. The chunks are runs of consecutive entries of
+        `frames` instead of neighbouring frames in the file, so pass `frames` in file order for sequential reads.
+    mp_context : multiprocessing context
+        Start method for the worker processes
+
+    Returns
+    -------
+    results : list or reduced value
+        The results of `func` in the order of `frames`, or the reduced value
+    """
+    reader = open_reader(cine_file)
+    if frames is None:
+        frames = range(len(reader))
+    frames = list(frames)
+    if reduce is not None:
+        if not frames:
+            raise ValueError("Cannot reduce the results of zero frames")
+        shards = [frames[i : i + chunk] for i in range(0, len(frames), chunk)]
+    else:
+        shards = shard_frames(reader, frames, chunk)
+
+    with _executor(reader, workers, mp_context) as executor:
+        futures = [executor.submit(_map_chunk, shard, func, reduce) for shard in shards]
+
+        if reduce is not None:
+            return functools.reduce(reduce, (future.result() for future in futures))
+
+        results: Dict[int, Any] = {}
+        for shard, future in zip(shards, futures):
+            results.update(zip(shard, future.result()))
+
+    return [results[frame_index] for frame_index in frames]
+
+
+def imap_frames(
+    cine_file: Source,
+    func: Callable[[np.ndarray], Any],
+    frames: Iterable[int] = None,
+    workers: int = None,
+    chunk: int = 32,
+    mp_context=None,
+) -> Generator[Tuple[int, Any], Any, None]:
+    """
+    Like `map_frames` but get a generator of `(frame_index, result)` in the order the chunks complete
+    """
+    reader = open_reader(cine_file)
+    shards = shard_frames(reader, frames, chunk)
+
+    with _executor(reader, workers, mp_context) as executor:
+        futures = {executor.submit(_map_chunk, shard, func): shard for shard in shards}
+        try:
+            for future in as_completed(futures):
+                yield from zip(futures[future], future.result())
+        finally:
+            for future in futures:
+                future.cancel()
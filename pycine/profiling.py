@@ -0,0 +1,162 @@
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple
+
+_enabled = False
+_started = None
+_lock = threading.Lock()
+# name: [calls, bytes, seconds]
+_stages: Dict[str, list] = {}
+
+
+class StageStats(NamedTuple):
+    calls: int
+    bytes: int
+    seconds: float
+
+
+def enable():
+    """
+    Start recording stage timings. Recording is off by default and the hooks then cost a single flag check.
+    """
+    global _enabled, _started
+    _enabled = True
+    _started = time.perf_counter()
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    global _started
+    with _lock:
+        _stages.clear()
+        _started = time.perf_counter() if _enabled else None
+
+
+def record(name: str, nbytes: int, seconds: float):
+    with _lock:
+        totals = _stages.setdefault(name, [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += nbytes
+        totals[2] += seconds
+
+
+def stats() -> Dict[str, StageStats]:
+    """
+    Get the call count, processed bytes and cumulative time of every stage recorded so far
+    """
+    with _lock:
+        return {name: StageStats(*totals) for name, totals in _stages.items()}
+
+
+class _Stage:
+    __slots__ = ("name", "nbytes", "start")
+
+    def __init__(self, name: str, nbytes: int):
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, self.nbytes, time.perf_counter() - self.start)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    @property
+    def nbytes(self) -> int:
+        return 0
+
+    @nbytes.setter
+    def nbytes(self, value: int):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str, nbytes: int = 0):
+    """
+    Context manager that times a block of code as stage `name`
+
+    Usage: `with stage("write", image.nbytes): cv2.imwrite(path, image)`. If the size is only known at the end, set
+    `nbytes` on the object returned by `with stage("read") as s:`.
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, nbytes)
+
+
+def _size(value: Any) -> int:
+    if hasattr(value, "nbytes"):
+        return value.nbytes
+    try:
+        return len(value)
+    except TypeError:
+        return 0
+
+
+def profiled(name: str, count: str = "input") -> Callable:
+    """
+    Decorator that times every call of a function as stage `name`
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage
+    count : str
+        Count the bytes of the first argument ("input") or of the return value ("output")
+    """
+
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            record(name, _size(result if count == "output" else args[0] if args else None), seconds)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def report() -> str:
+    """
+    Format the recorded stages as a table with the throughput of each stage
+
+    Stages may be nested (e.g. `unpack` runs inside `decode`) and run in several threads, so their times do not add up
+    to the wall time.
+    """
+    wall = time.perf_counter() - _started if _started is not None else 0.0
+    lines = [f"{'stage':<16} {'calls':>8} {'total s':>10} {'ms/call':>10} {'MiB':>10} {'MiB/s':>10} {'% wall':>7}"]
+    for name, (calls, nbytes, seconds) in sorted(stats().items(), key=lambda item: -item[1].seconds):
+        mib = nbytes / 2 ** 20
+        lines.append(
+            f"{name:<16} {calls:>8} {seconds:>10.3f} {seconds / calls * 1e3:>10.3f} {mib:>10.1f} "
+            f"{mib / seconds if seconds else 0:>10.1f} {seconds / wall * 100 if wall else 0:>6.1f}%"
+        )
+    lines.append(f"wall time {wall:.3f} s")
+    return "\n".join(lines)
@@ -1,22 +1,37 @@
 import logging
+import os
 import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from os import PathLike
-from typing import Generator, Tuple, Union, Any
+from typing import TYPE_CHECKING, Generator, Tuple, Union, Any, BinaryIO, Callable
 
 import numpy as np
 
 from pycine.cine import SETUP
+from pycine.decode import get_decoder, register_decoder
 from pycine.file import read_header, Header
 from pycine.linLUT import linLUT
+from pycine.profiling import profiled
+
+if TYPE_CHECKING:
+    from pycine.calibration import Calibration
 
 logger = logging.getLogger()
 
+# Region of interest as (top, bottom, left, right) with exclusive bottom and right edges
+Roi = Tuple[int, int, int, int]
+
 
 def frame_reader(
     cine_file: Union[str, bytes, PathLike],
     header: Header,
     start_frame: int = 1,
     count: int = None,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+    calibration: "Calibration" = None,
 ) -> Generator[np.ndarray, Any, None]:
     frame = start_frame
     if not count:
@@ -27,24 +42,188 @@ def frame_reader(
             frame_index = frame - 1
             logger.debug(f"Reading frame {frame}")
 
-            f.seek(header["pImage"][frame_index])
-
-            annotation_size = struct.unpack("I", f.read(4))[0]
-            annotation = struct.unpack(f"{annotation_size - 8}B", f.read((annotation_size - 8) // 8))
-            # TODO: Save annotations
-
-            image_size = struct.unpack("I", f.read(4))[0]
-
-            data = f.read(image_size)
+            data = read_image_data(f, header, frame_index)
 
-            raw_image = create_raw_array(data, header)
+            raw_image = create_raw_array(data, header, normalize, dtype, calibration=calibration)
 
             yield raw_image
             frame += 1
             count -= 1
 
 
-def read_bpp(header):
+def parallel_frame_reader(
+    cine_file: Union[str, bytes, PathLike],
+    header: Header,
+    start_frame: int = 1,
+    count: int = None,
+    workers: int = None,
+    decode: Callable[[bytes, Header], Any] = None,
+) -> Generator[Any, Any, None]:
+    """
+    Like `frame_reader` but decode frames in a thread pool while the file is read sequentially
+
+    Frames are yielded in order. At most two frames per worker are in flight, so memory stays bounded.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    header : dict
+        A dictionary contains header information of the cine file
+    start_frame : int
+        First frame to read (1 based like `frame_reader`)
+    count : int
+        maximum number of frames to get.
+    workers : int
+        Number of decoding threads. Defaults to the number of CPUs.
+    decode : callable
+        Called as `decode(data, header)` in a worker thread. Defaults to `create_raw_array`. Passing a function that
+        reduces the frame (e.g. to statistics) keeps the work and the memory in the workers.
+
+    Returns
+    -------
+    generator
+        A generator for the results of `decode`
+    """
+    if not count:
+        count = header["cinefileheader"].ImageCount
+    if not workers:
+        workers = os.cpu_count() or 1
+    if decode is None:
+        decode = create_raw_array
+
+    with open(cine_file, "rb") as f, ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for frame_index in range(start_frame - 1, start_frame - 1 + count):
+            logger.debug(f"Reading frame {frame_index + 1}")
+            pending.append(executor.submit(decode, read_image_data(f, header, frame_index), header))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def frame_windows(
+    cine_file: Union[str, bytes, PathLike],
+    k: int,
+    step: int = 1,
+    start_frame: int = 1,
+    count: int = None,
+    buffer_frames: int = None,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+) -> Generator[np.ndarray, Any, None]:
+    """
+    Get a generator of windows of `k` consecutive raw images
+
+    Every frame is decoded once into a ring buffer and each window is a read-only `(k, height, width)` view on that
+    buffer. A window is only valid until the generator is advanced: the next step may overwrite the buffer. Use
+    `.copy()` on a window to keep it.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    k : int
+        Number of frames in a window
+    step : int
+        Number of frames between the starts of two windows. Frames that are in no window are not decoded.
+    start_frame : int
+        First frame to read (1 based like `frame_reader`)
+    count : int
+        maximum number of frames to get.
+    buffer_frames : int
+        Size of the ring buffer in frames (at least `k`, default `3 * k`). Whenever a window would reach past the end
+        of the buffer, the frames still in use are moved to the front once.
+    normalize : bool
+        If False, get the unpacked sensor values (see `create_raw_array`)
+    dtype : numpy dtype
+        uint8, uint16 (default) or float32 for normalized frames (see `create_raw_array`)
+
+    Returns
+    -------
+    window_generator : generator
+        A generator for `(k, height, width)` views
+    """
+    header = read_header(cine_file)
+    if not count:
+        count = header["cinefileheader"].ImageCount - start_frame + 1
+    buffer_frames = max(buffer_frames or 3 * k, k)
+    end_index = start_frame - 1 + count
+
+    buffer = None
+    first = start_frame - 1  # frame index of buffer[position]
+    position = 0
+    filled = 0
+    with open(cine_file, "rb") as f:
+        for window_start in range(start_frame - 1, end_index - k + 1, step):
+            drop = min(window_start - first, filled)
+            position += drop
+            filled -= drop
+            first = window_start
+            if not filled:
+                position = 0
+
+            if position + k > buffer_frames:
+                buffer[:filled] = buffer[position : position + filled]
+                position = 0
+
+            while filled < k:
+                frame_index = first + filled
+                logger.debug(f"Reading frame {frame_index + 1}")
+                raw_image = create_raw_array(read_image_data(f, header, frame_index), header, normalize, dtype)
+                if buffer is None:
+                    buffer = np.empty((buffer_frames,) + raw_image.shape, dtype=raw_image.dtype)
+                buffer[position + filled] = raw_image
+                filled += 1
+
+            window = buffer[position : position + k].view()
+            window.flags.writeable = False
+            yield window
+
+
+@profiled("read", count="output")
+def read_image_data(f: BinaryIO, header: Header, frame_index: int) -> bytes:
+    """
+    Read the packed image data of a single frame
+
+    The image data follows an annotation of `annotation_size` bytes (at least 8, cameras usually write more), which
+    is skipped as a whole.
+
+    Parameters
+    ----------
+    f : file-like object
+        A cine file opened in binary mode
+    header : dict
+        A dictionary contains header information of the cine file
+    frame_index : int
+        Zero based index into the pImage table
+
+    Returns
+    -------
+    data : bytes
+        The image data as stored in the cine file
+    """
+    f.seek(header["pImage"][frame_index])
+
+    annotation_size = struct.unpack("I", _read_exactly(f, 4, frame_index))[0]
+    # TODO: Save annotations
+    f.seek(annotation_size - 8, 1)
+
+    image_size = struct.unpack("I", _read_exactly(f, 4, frame_index))[0]
+
+    return _read_exactly(f, image_size, frame_index)
+
+
+def _read_exactly(f: BinaryIO, size: int, frame_index: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError(f"Frame {frame_index + 1} is truncated, use pycine.file.recover_header to read intact frames")
+    return data
+
+
+def read_bpp(header, normalize=True):
     """
     Get bit depth (bit per pixel) from header
 
@@ -52,13 +231,19 @@ def read_bpp(header):
     ----------
     header : dict
         A dictionary contains header information of the cine file
+    normalize : bool
+        If False, get the bit depth of the unpacked sensor values before normalization
 
     Returns
     -------
     bpp : int
         Bit depth of the cine file
     """
-    if header["bitmapinfoheader"].biCompression:
+    if not normalize and header["bitmapinfoheader"].biCompression == 256:
+        bpp = 10
+    elif not normalize and header["bitmapinfoheader"].biCompression == 1024:
+        bpp = 12
+    elif header["bitmapinfoheader"].biCompression:
         # After applying the linearization LUT the bit depth is 12bit
         bpp = 12
     else:
@@ -67,7 +252,13 @@ def read_bpp(header):
 
 
 def image_generator(
-    cine_file: Union[str, bytes, PathLike], start_frame: int = None, start_frame_cine: int = None, count: int = None
+    cine_file: Union[str, bytes, PathLike],
+    start_frame: int = None,
+    start_frame_cine: int = None,
+    count: int = None,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+    calibration: "Calibration" = None,
 ) -> Generator[np.ndarray, Any, None]:
     """
     Get only a generator of raw images for specified cine file.
@@ -88,6 +279,12 @@ def image_generator(
         If both are specified, raise ValueError.
     count : int
         maximum number of frames to get.
+    normalize : bool
+        If False, get the unpacked sensor values (see `create_raw_array`)
+    dtype : numpy dtype
+        uint8, uint16 (default) or float32 for normalized frames (see `create_raw_array`)
+    calibration : pycine.calibration.Calibration
+        Dark frame and flat field correction applied while decoding (see `create_raw_array`)
 
     Returns
     -------
@@ -109,12 +306,26 @@ def image_generator(
             raise ValueError(
                 f"Cannot read frame {start_frame_cine:d}. This cine has only from {first_image_number:d} to {last_image_number:d}."
             )
-    raw_image_generator = frame_reader(cine_file, header, start_frame=fetch_head, count=count)
+    raw_image_generator = frame_reader(
+        cine_file,
+        header,
+        start_frame=fetch_head,
+        count=count,
+        normalize=normalize,
+        dtype=dtype,
+        calibration=calibration,
+    )
     return raw_image_generator
 
 
 def read_frames(
-    cine_file: Union[str, bytes, PathLike], start_frame: int = None, start_frame_cine: int = None, count: int = None
+    cine_file: Union[str, bytes, PathLike],
+    start_frame: int = None,
+    start_frame_cine: int = None,
+    count: int = None,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+    calibration: "Calibration" = None,
 ) -> Tuple[Generator[np.ndarray, Any, None], SETUP, int]:
     """
     Get a generator of raw images for specified cine file.
@@ -135,6 +346,12 @@ def read_frames(
         If both are specified, raise ValueError.
     count : int
         maximum number of frames to get.
+    normalize : bool
+        If False, get the unpacked sensor values (see `create_raw_array`)
+    dtype : numpy dtype
+        uint8, uint16 (default) or float32 for normalized frames (see `create_raw_array`)
+    calibration : pycine.calibration.Calibration
+        Dark frame and flat field correction applied while decoding (see `create_raw_array`)
 
     Returns
     -------
@@ -143,15 +360,27 @@ def read_frames(
     setup : pycine.cine.tagSETUP class
         A class contains setup data of the cine file
     bpp : int
-        Bit depth of the raw images
+        Bit depth of the raw images. uint8 and float32 frames span `[0, 255]` and `[0, 1]` instead.
     """
     header = read_header(cine_file)
-    bpp = read_bpp(header)
+    bpp = read_bpp(header, normalize)
     setup = header["setup"]
-    raw_image_generator = image_generator(cine_file, start_frame, start_frame_cine, count)
+    raw_image_generator = image_generator(
+        cine_file, start_frame, start_frame_cine, count, normalize, dtype, calibration
+    )
     return raw_image_generator, setup, bpp
 
 
+def crop_roi(raw_image: np.ndarray, roi: Roi = None) -> np.ndarray:
+    """
+    Get a view on the region of interest of an image. A `roi` of None returns the full image.
+    """
+    if roi is None:
+        return raw_image
+    top, bottom, left, right = roi
+    return raw_image[top:bottom, left:right]
+
+
 def unpack_10bit(data: bytes, width: int, height: int) -> np.ndarray:
     packed = np.frombuffer(data, dtype="uint8").astype(np.uint16)
     unpacked = np.zeros([height, width], dtype="uint16")
@@ -173,7 +402,62 @@ def unpack_12bit(data: bytes, width: int, height: int) -> np.ndarray:
     return unpacked
 
 
-def create_raw_array(data: bytes, header) -> np.ndarray:
+@profiled("unpack", count="output")
+def unpack_sampled(data: bytes, header, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """
+    Unpack only the pixels at the intersection of `rows` and `columns` directly from the image data
+
+    The result equals `unpack_raw_array(data, header)[rows][:, columns]`, but only the sampled bytes are touched, so
+    decimating a P10/P12L frame costs a fraction of unpacking it.
+
+    Parameters
+    ----------
+    data : bytes
+        The image data as stored in the cine file
+    header : dict
+        A dictionary contains header information of the cine file
+    rows, columns : np.ndarray
+        Zero based row and column indices in the orientation of `unpack_raw_array`
+    """
+    width, height = header["bitmapinfoheader"].biWidth, header["bitmapinfoheader"].biHeight
+    compression = header["bitmapinfoheader"].biCompression
+    rows = np.asarray(rows, dtype=np.intp)
+    columns = np.asarray(columns, dtype=np.intp)
+
+    if compression == 0:  # uncompressed data, stored bottom-up
+        bit_count = header["bitmapinfoheader"].biBitCount
+        if bit_count not in (8, 16):
+            raise ValueError("Only 16 and 8bit frames are supported")
+        pixels = np.frombuffer(data, dtype=np.uint16 if bit_count == 16 else np.uint8).reshape(height, width)
+        return pixels[(height - 1 - rows)[:, None], columns]
+
+    if compression == 256:  # 10bit / P10 compressed
+        bits = 10
+    elif compression == 1024:  # 12bit / P12L compressed
+        bits = 12
+    else:
+        raise ValueError("biCompression is invalid")
+
+    # Pixels are packed most significant bit first, so every pixel lies within the two bytes at its bit offset
+    lines = np.frombuffer(data, dtype=np.uint8).reshape(height, width * bits // 8)[rows]
+    bit_offsets = columns * bits
+    first_bytes = bit_offsets // 8
+    shifts = (16 - bits - bit_offsets % 8).astype(np.uint16)
+    words = lines.take(first_bytes, axis=1).astype(np.uint16)
+    words <<= 8
+    words |= lines.take(first_bytes + 1, axis=1)
+    words >>= shifts
+    words &= 2 ** bits - 1
+    return words
+
+
+@profiled("unpack")
+def unpack_raw_array(data: bytes, header) -> np.ndarray:
+    """
+    Unpack the image data into sensor values without any normalization
+
+    8 and 16bit uncompressed data is returned as a read-only view on `data`.
+    """
     width, height = header["bitmapinfoheader"].biWidth, header["bitmapinfoheader"].biHeight
 
     if header["bitmapinfoheader"].biCompression == 0:  # uncompressed data
@@ -185,22 +469,132 @@ def create_raw_array(data: bytes, header) -> np.ndarray:
             raise ValueError("Only 16 and 8bit frames are supported")
         raw_image.shape = (height, width)
         raw_image = np.flipud(raw_image)
-        raw_image = np.interp(
-            raw_image, [header["setup"].BlackLevel, header["setup"].WhiteLevel], [0, 2 ** header["setup"].RealBPP - 1]
-        ).astype(np.uint16)
 
     elif header["bitmapinfoheader"].biCompression == 256:  # 10bit / P10 compressed
         raw_image = unpack_10bit(data, width, height)
-        raw_image = linLUT[raw_image].astype(np.uint16)
-        raw_image = np.interp(raw_image, [64, 4064], [0, 2 ** 12 - 1]).astype(np.uint16)
 
     elif header["bitmapinfoheader"].biCompression == 1024:  # 12bit / P12L compressed
         raw_image = unpack_12bit(data, width, height)
-        raw_image = np.interp(
-            raw_image, [header["setup"].BlackLevel, header["setup"].WhiteLevel], [0, 2 ** header["setup"].RealBPP - 1]
-        ).astype(np.uint16)
 
     else:
         raise ValueError("biCompression is invalid")
 
     return raw_image
+
+
+@lru_cache(maxsize=32)
+def _normalization_lut(compression: int, bit_count: int, black: int, white: int, real_bpp: int, dtype: str):
+    if compression == 256:  # 10bit / P10 compressed
+        codes = linLUT.astype(np.uint16)
+        levels = [64, 4064]
+        bpp = 12
+    elif compression == 1024:  # 12bit / P12L compressed
+        codes = np.arange(2 ** 12)
+        levels = [black, white]
+        bpp = real_bpp
+    elif compression == 0:  # uncompressed data
+        codes = np.arange(2 ** bit_count)
+        levels = [black, white]
+        bpp = real_bpp
+    else:
+        raise ValueError("biCompression is invalid")
+
+    if dtype == "uint16":
+        lut = np.interp(codes, levels, [0, 2 ** bpp - 1]).astype(np.uint16)
+    elif dtype == "uint8":
+        lut = (np.interp(codes, levels, [0, 255]) + 0.5).astype(np.uint8)
+    elif dtype == "float32":
+        lut = np.interp(codes, levels, [0, 1]).astype(np.float32)
+    else:
+        raise ValueError("Only uint8, uint16 and float32 frames are supported")
+
+    lut.setflags(write=False)
+    return lut
+
+
+def normalization_lut(header, dtype: np.dtype = None) -> np.ndarray:
+    """
+    Get the read-only LUT that maps unpacked sensor values to normalized values of `dtype` (see `create_raw_array`)
+    """
+    return _normalization_lut(
+        header["bitmapinfoheader"].biCompression,
+        header["bitmapinfoheader"].biBitCount,
+        header["setup"].BlackLevel,
+        header["setup"].WhiteLevel,
+        header["setup"].RealBPP,
+        np.dtype(dtype or np.uint16).name,
+    )
+
+
+@profiled("normalize")
+def normalize_raw_array(raw_image: np.ndarray, header, dtype: np.dtype = None) -> np.ndarray:
+    """
+    Rescale unpacked sensor values to `[0, 2**bpp - 1]` (see `read_bpp`), `[0, 255]` or `[0, 1]` depending on `dtype`
+
+    Linearization, rescaling and the type conversion are a single lookup per pixel.
+    """
+    return np.take(normalization_lut(header, dtype), raw_image, mode="clip")
+
+
+@register_decoder("numpy", 0)
+@register_decoder("numpy", 256)
+@register_decoder("numpy", 1024)
+def decode_numpy(
+    data: bytes, header, normalize: bool = True, dtype: np.dtype = None, calibration: "Calibration" = None
+) -> np.ndarray:
+    """
+    The reference decoder, all other backends must produce identical frames
+    """
+    raw_image = unpack_raw_array(data, header)
+    if calibration is not None:
+        return calibration.apply(normalize_raw_array(raw_image, header, np.float32), header, dtype)
+    if normalize:
+        raw_image = normalize_raw_array(raw_image, header, dtype)
+    return raw_image
+
+
+@profiled("decode")
+def create_raw_array(
+    data: bytes,
+    header,
+    normalize: bool = True,
+    dtype: np.dtype = None,
+    backend: str = None,
+    calibration: "Calibration" = None,
+) -> np.ndarray:
+    """
+    Decode the image data of a frame
+
+    Parameters
+    ----------
+    data : bytes
+        The image data as stored in the cine file
+    header : dict
+        A dictionary contains header information of the cine file
+    normalize : bool
+        If True, rescale to `[0, 2**bpp - 1]` (see `read_bpp`) as uint16. If False, return the camera's native counts
+        without any float work: 10bit P10 codes, 12bit P12L values or a zero-copy, read-only view for 8 and 16bit
+        uncompressed data.
+    dtype : numpy dtype
+        Type of normalized frames: uint16 (default) in `[0, 2**bpp - 1]`, uint8 in `[0, 255]` or float32 in `[0, 1]`.
+        Frames are produced in this type directly.
+    backend : str
+        Decode with this backend (see `pycine.decode.get_decoder`). By default the fastest available one is used.
+    calibration : pycine.calibration.Calibration
+        Subtract a dark frame and apply a flat field gain while decoding. Only normalized frames can be calibrated.
+
+    Returns
+    -------
+    raw_image : np.ndarray
+        The decoded image
+    """
+    if not normalize and dtype is not None:
+        raise ValueError("dtype can only be chosen for normalized frames")
+
+    decoder = get_decoder(header, backend)
+    if calibration is not None:
+        if not normalize:
+            raise ValueError("Only normalized frames can be calibrated")
+        return decoder(data, header, normalize, dtype, calibration=calibration)
+
+    return decoder(data, header, normalize, dtype)
@@ -0,0 +1,158 @@
+import logging
+import os
+import struct
+import threading
+from os import PathLike
+from typing import Any, Generator, Tuple, Union
+
+import numpy as np
+
+from pycine.cache import FrameCache, clip_id
+from pycine.file import read_header, Header
+from pycine.profiling import profiled
+from pycine.raw import create_raw_array
+
+logger = logging.getLogger()
+
+
+class CineReader:
+    """
+    Random access to the frames of a cine file that can be shared between threads
+
+    All reads go through `os.pread` on a single file descriptor, so any number of threads can fetch frames
+    concurrently without locking. The image data offset and size of a frame are looked up on first access and
+    remembered. The descriptor is reopened automatically in a forked child and a reader can be pickled to send it to
+    worker processes. On platforms without `os.pread` reads fall back to a locked seek and read.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    header : dict
+        A dictionary contains header information of the cine file. Read from `cine_file` if not given, e.g. pass a
+        recovered header to only read the valid part of a clip.
+    cache : FrameCache
+        Serve decoded frames from this cache if given
+    """
+
+    def __init__(self, cine_file: Union[str, bytes, PathLike], header: Header = None, cache: FrameCache = None):
+        self.cine_file = cine_file
+        self.header = header if header is not None else read_header(cine_file)
+        self.cache = cache
+        self.clip_id = clip_id(cine_file)
+
+        image_count = len(self.header["pImage"])
+        self._image_offsets = np.full(image_count, -1, dtype=np.int64)
+        self._image_sizes = np.zeros(image_count, dtype=np.int64)
+
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_fd"] = state["_pid"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._image_offsets)
+
+    def __getitem__(self, frame_index: int) -> np.ndarray:
+        if frame_index < 0:
+            frame_index += len(self)
+        if not 0 <= frame_index < len(self):
+            raise IndexError(f"Frame index {frame_index} out of range")
+        return self.get(frame_index)
+
+    @property
+    def fd(self) -> int:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Never close a descriptor inherited from the parent, it is still in use there
+                    self._fd = os.open(self.cine_file, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+                    self._pid = os.getpid()
+        return self._fd
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None and self._pid == os.getpid():
+                os.close(self._fd)
+            self._fd = self._pid = None
+
+    def pread(self, size: int, offset: int) -> bytes:
+        if hasattr(os, "pread"):
+            data = os.pread(self.fd, size, offset)
+        else:
+            with self._lock:
+                os.lseek(self.fd, offset, os.SEEK_SET)
+                data = os.read(self.fd, size)
+
+        if len(data) != size:
+            raise ValueError(f"{self.cine_file} is truncated at byte {offset + len(data)}")
+        return data
+
+    def locate(self, frame_index: int) -> Tuple[int, int]:
+        """
+        Get offset and size of the image data of a frame
+        """
+        if self._image_offsets[frame_index] < 0:
+            pointer = self.header["pImage"][frame_index]
+            annotation_size, image_size = struct.unpack("II", self.pread(8, pointer))
+            if annotation_size != 8:
+                # TODO: Save annotations
+                image_size = struct.unpack("I", self.pread(4, pointer + annotation_size - 4))[0]
+            self._image_sizes[frame_index] = image_size
+            self._image_offsets[frame_index] = pointer + annotation_size
+
+        return int(self._image_offsets[frame_index]), int(self._image_sizes[frame_index])
+
+    def file_position(self, frame_index: int) -> Tuple[int, int]:
+        """
+        Get a (clip, byte offset) key of a frame. Sorting frames by it gives the order they are stored on disk.
+        """
+        return 0, self.header["pImage"][frame_index]
+
+    @profiled("read", count="output")
+    def read_data(self, frame_index: int) -> bytes:
+        """
+        Read the packed image data of a frame (zero based index into the pImage table)
+        """
+        offset, size = self.locate(frame_index)
+        return self.pread(size, offset)
+
+    def get(self, frame_index: int, normalize: bool = True, dtype: np.dtype = None) -> np.ndarray:
+        """
+        Read and decode a frame (zero based index into the pImage table), see `create_raw_array` for the options
+        """
+        if self.cache is None:
+            return create_raw_array(self.read_data(frame_index), self.header, normalize, dtype)
+
+        key = self.cache.key(self.clip_id, frame_index, normalize=normalize, dtype=dtype)
+        raw_image = self.cache.get(key)
+        if raw_image is None:
+            data = self.read_data(frame_index)
+            raw_image = self.cache.put(key, create_raw_array(data, self.header, normalize, dtype))
+        return raw_image
+
+    def frames(
+        self, start_frame: int = 1, count: int = None, normalize: bool = True, dtype: np.dtype = None
+    ) -> Generator[np.ndarray, Any, None]:
+        """
+        Get a generator of raw images like `pycine.raw.frame_reader`
+        """
+        if not count:
+            count = len(self) - start_frame + 1
+        for frame_index in range(start_frame - 1, start_frame - 1 + count):
+            yield self.get(frame_index, normalize, dtype)
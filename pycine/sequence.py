@@ -0,0 +1,124 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import Any, Generator, Iterable, Tuple, Union
+
+import numpy as np
+
+from pycine.cache import FrameCache
+from pycine.file import Header
+from pycine.reader import CineReader
+
+
+def trigger_time(header: Header) -> float:
+    """
+    Get the trigger time of a clip in seconds since 1970
+    """
+    time = header["cinefileheader"].TriggerTime
+    return time.seconds + time.fractions / 2 ** 32
+
+
+class CineSequence:
+    """
+    Several cine files (segments of a take or clips of several cameras) presented as one sequence of frames
+
+    The clips are ordered by trigger time and first image number. Each clip's header is read once and each clip is
+    opened once through a `CineReader`. Frames are addressed by a zero based global index.
+
+    Parameters
+    ----------
+    paths : iterable
+        Paths to the cine files
+    cache : FrameCache
+        Serve decoded frames from this cache if given
+    """
+
+    def __init__(self, paths: Iterable[Union[str, bytes, PathLike]], cache: FrameCache = None):
+        readers = [CineReader(path, cache=cache) for path in paths]
+        if not readers:
+            raise ValueError("A sequence needs at least one clip")
+        readers.sort(key=lambda r: (trigger_time(r.header), r.header["cinefileheader"].FirstImageNo))
+        self.readers = readers
+
+        counts = [len(reader) for reader in readers]
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+        self.clip_index = np.repeat(np.arange(len(readers)), counts)
+        self.pImage = np.concatenate([np.asarray(reader.header["pImage"], dtype=np.int64) for reader in readers])
+        self.timestamp = np.concatenate(
+            [
+                reader.header["timestamp"] if len(reader.header["timestamp"]) == count else np.full(count, np.nan)
+                for reader, count in zip(readers, counts)
+            ]
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, frame_index: int) -> np.ndarray:
+        if frame_index < 0:
+            frame_index += len(self)
+        if not 0 <= frame_index < len(self):
+            raise IndexError(f"Frame index {frame_index} out of range")
+        return self.get(frame_index)
+
+    @property
+    def paths(self):
+        return [reader.cine_file for reader in self.readers]
+
+    def close(self):
+        for reader in self.readers:
+            reader.close()
+
+    def locate(self, frame_index: int) -> Tuple[CineReader, int]:
+        """
+        Get the reader and the index within its clip for a global frame index
+        """
+        clip = self.clip_index[frame_index]
+        return self.readers[clip], frame_index - int(self.starts[clip])
+
+    def file_position(self, frame_index: int) -> Tuple[int, int]:
+        return int(self.clip_index[frame_index]), int(self.pImage[frame_index])
+
+    def read_data(self, frame_index: int) -> bytes:
+        reader, local_index = self.locate(frame_index)
+        return reader.read_data(local_index)
+
+    def get(self, frame_index: int, normalize: bool = True, dtype: np.dtype = None) -> np.ndarray:
+        reader, local_index = self.locate(frame_index)
+        return reader.get(local_index, normalize, dtype)
+
+    def frames(
+        self,
+        start_frame: int = 1,
+        count: int = None,
+        prefetch: int = 4,
+        normalize: bool = True,
+        dtype: np.dtype = None,
+    ) -> Generator[np.ndarray, Any, None]:
+        """
+        Get a generator of raw images over the whole sequence
+
+        Up to `prefetch` frames are read and decoded ahead in threads, also across clip boundaries.
+        """
+        if not count:
+            count = len(self) - start_frame + 1
+
+        with ThreadPoolExecutor(max(prefetch, 1)) as executor:
+            pending = deque()
+            try:
+                for frame_index in range(start_frame - 1, start_frame - 1 + count):
+                    pending.append(executor.submit(self.get, frame_index, normalize, dtype))
+                    if len(pending) > prefetch:
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,188 @@
+import email.utils
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from pycine.cache import FrameCache, clip_id
+from pycine.color import preview_8bit
+from pycine.file import header_to_dict
+from pycine.raw import read_bpp
+from pycine.reader import CineReader
+
+logger = logging.getLogger()
+
+ROUTE = re.compile(r"^/(?P<clip>.+?\.cine)/(?:(?P<header>header\.json)|frames/(?P<frame>\d+)\.(?P<ext>npy|jpg))$")
+
+
+class FrameServer(ThreadingHTTPServer):
+    """
+    A HTTP server for the clips in a directory
+
+    Routes:
+        /                                   JSON list of clips
+        /<clip>/header.json                 The header of a clip as JSON
+        /<clip>/frames/<index>.npy          A raw frame (zero based index) as .npy
+        /<clip>/frames/<index>.jpg          An 8bit preview, use ?width=<pixels> to scale it down
+
+    All clips share one decoded-frame cache and keep one open `CineReader` each. A reader is replaced when its clip
+    changes on disk.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], directory: str, cache_bytes: int = 512 * 2 ** 20):
+        super().__init__(address, FrameRequestHandler)
+        self.directory = os.path.realpath(directory)
+        self.cache = FrameCache(cache_bytes)
+        self.readers: Dict[str, CineReader] = {}
+        self.readers_lock = threading.Lock()
+
+    def clips(self):
+        clips = []
+        for path, _, files in os.walk(self.directory):
+            for name in files:
+                if name.lower().endswith(".cine"):
+                    clips.append(os.path.relpath(os.path.join(path, name), self.directory).replace(os.sep, "/"))
+        return sorted(clips)
+
+    def reader(self, clip: str) -> Optional[CineReader]:
+        cine_file = os.path.realpath(os.path.join(self.directory, clip))
+        if not cine_file.startswith(self.directory + os.sep) or not os.path.isfile(cine_file):
+            return None
+
+        with self.readers_lock:
+            reader = self.readers.get(cine_file)
+            if reader is None or reader.clip_id != clip_id(cine_file):
+                if reader is not None:
+                    reader.close()
+                reader = self.readers[cine_file] = CineReader(cine_file, cache=self.cache)
+        return reader
+
+    def server_close(self):
+        super().server_close()
+        with self.readers_lock:
+            for reader in self.readers.values():
+                reader.close()
+            self.readers.clear()
+
+
+class FrameRequestHandler(BaseHTTPRequestHandler):
+    server: FrameServer
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def handle_request(self, send_body: bool):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+
+        if path == "/":
+            body = json.dumps(self.server.clips()).encode()
+            return self.send_body(body, "application/json", None, None, send_body)
+
+        match = ROUTE.match(path)
+        reader = match and self.server.reader(match["clip"])
+        if not reader:
+            return self.send_error(HTTPStatus.NOT_FOUND)
+
+        _, size, mtime_ns = reader.clip_id
+        try:
+            width = int(query.get("width", ["0"])[0] or 0)
+        except ValueError:
+            width = -1
+        if width < 0:
+            return self.send_error(HTTPStatus.BAD_REQUEST, "width must be a positive integer")
+        etag = '"' + hashlib.sha1(f"{path}:{width}:{size}:{mtime_ns}".encode()).hexdigest() + '"'
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_cache_headers(etag, mtime_ns)
+            return self.end_headers()
+
+        if match["header"]:
+            body = json.dumps(header_to_dict(reader.header)).encode()
+            return self.send_body(body, "application/json", etag, mtime_ns, send_body)
+
+        frame_index = int(match["frame"])
+        if frame_index >= len(reader):
+            return self.send_error(HTTPStatus.NOT_FOUND)
+        raw_image = reader.get(frame_index)
+
+        if match["ext"] == "npy":
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, raw_image, allow_pickle=False)
+            return self.send_body(buffer.getvalue(), "application/octet-stream", etag, mtime_ns, send_body)
+
+        import cv2
+
+        image = preview_8bit(raw_image, reader.header["setup"], read_bpp(reader.header), width or None)
+        success, jpeg = cv2.imencode(".jpg", image)
+        if not success:
+            return self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+        return self.send_body(jpeg.tobytes(), "image/jpeg", etag, mtime_ns, send_body)
+
+    def send_cache_headers(self, etag: str, mtime_ns: int):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(mtime_ns / 1e9, usegmt=True))
+        # The ETag changes with the clip, so clients may keep responses but have to revalidate them
+        self.send_header("Cache-Control", "no-cache")
+
+    def send_body(self, body: bytes, content_type: str, etag: Optional[str], mtime_ns: Optional[int], send_body: bool):
+        status = HTTPStatus.OK
+        content_range = None
+
+        range_header = self.headers.get("Range")
+        if range_header:
+            byte_range = parse_range(range_header, len(body))
+            if byte_range is None:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                return self.end_headers()
+            first, last = byte_range
+            content_range = f"bytes {first}-{last}/{len(body)}"
+            body = body[first : last + 1]
+            status = HTTPStatus.PARTIAL_CONTENT
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        if etag:
+            self.send_cache_headers(etag, mtime_ns)
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write(body)
+
+
+def parse_range(range_header: str, length: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=first-last` range into inclusive offsets. Returns None if it can not be satisfied.
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or match[1] == match[2] == "":
+        return None
+    if match[1] == "":
+        first, last = max(length - int(match[2]), 0), length - 1
+    else:
+        first = int(match[1])
+        last = min(int(match[2]), length - 1) if match[2] else length - 1
+    if first > last:
+        return None
+    return first, last
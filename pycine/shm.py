@@ -0,0 +1,206 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+from os import PathLike
+from typing import Any, Callable, Generator, List, Tuple, Union
+
+import numpy as np
+
+from pycine.file import read_header
+from pycine.raw import read_frames
+
+logger = logging.getLogger()
+
+
+class FrameRing:
+    """
+    A ring of fixed-size frame slots in shared memory
+
+    A producer copies each decoded frame into a free slot and only passes the slot index and frame number to the
+    consumers through a queue. Consumers hand the slot back once they are done with it. If all slots are in use the
+    producer blocks, which limits memory use and applies backpressure to decoding.
+
+    Pass the ring to worker processes as an argument of `multiprocessing.Process` (the queues can not be sent through
+    a `Pool`). Only the creating process unlinks the shared memory.
+
+    Parameters
+    ----------
+    slots : int
+        Number of frames the ring holds
+    shape : tuple
+        Shape of a frame
+    dtype : np.dtype
+        Type of a frame
+    context : multiprocessing context
+        Used to create the queues. Defaults to the default context.
+    """
+
+    def __init__(self, slots: int, shape: Tuple[int, ...], dtype=np.uint16, context=None):
+        context = context or multiprocessing.get_context()
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.frame_bytes)
+        self.owner_pid = os.getpid()
+
+        self.free = context.Queue()
+        self.filled = context.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+
+    @classmethod
+    def for_clip(cls, cine_file: Union[str, bytes, PathLike], slots: int = 8, context=None) -> "FrameRing":
+        """
+        Create a ring with slots for the normalized uint16 frames of a clip
+        """
+        header = read_header(cine_file)
+        shape = (header["bitmapinfoheader"].biHeight, header["bitmapinfoheader"].biWidth)
+        return cls(slots, shape, np.uint16, context)
+
+    def slot(self, slot: int) -> np.ndarray:
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf, offset=slot * self.frame_bytes)
+
+    def put(self, frame_number: int, raw_image: np.ndarray):
+        """
+        Copy a frame into the next free slot, blocking until one is available
+        """
+        slot = self.free.get()
+        self.slot(slot)[...] = raw_image
+        self.filled.put((slot, frame_number))
+
+    def finish(self, consumers: int = 1):
+        """
+        Tell `consumers` consumers that no more frames will be put into the ring
+        """
+        for _ in range(consumers):
+            self.filled.put(None)
+
+    def frames(self) -> Generator[Tuple[int, np.ndarray], Any, None]:
+        """
+        Get a generator of `(frame_number, raw_image)` from the ring
+
+        `raw_image` is a view on shared memory. Its slot is handed back to the producer when the generator is
+        advanced, so the view must not be used afterwards. Use `.copy()` to keep a frame.
+        """
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            slot, frame_number = item
+            try:
+                yield frame_number, self.slot(slot)
+            finally:
+                self.free.put(slot)
+
+    def close(self):
+        """
+        Detach from the shared memory and remove it if this process created it
+        """
+        self.shm.close()
+        if os.getpid() == self.owner_pid:
+            self.shm.unlink()
+
+
+def produce(
+    cine_file: Union[str, bytes, PathLike],
+    ring: FrameRing,
+    start_frame: int = 1,
+    count: int = None,
+    consumers: int = 1,
+):
+    """
+    Decode frames with `read_frames` into `ring` and signal the end to `consumers` consumers
+    """
+    raw_images, setup, bpp = read_frames(cine_file, start_frame=start_frame, count=count)
+    try:
+        for i, raw_image in enumerate(raw_images):
+            ring.put(start_frame + i, raw_image)
+    finally:
+        ring.finish(consumers)
+
+
+def _consume(ring: FrameRing, func: Callable[[np.ndarray], Any], results):
+    try:
+        for frame_number, raw_image in ring.frames():
+            try:
+                results.put((frame_number, func(raw_image), None))
+            except Exception as e:
+                results.put((frame_number, None, e))
+            del raw_image
+    finally:
+        ring.shm.close()
+
+
+def map_frames_shared(
+    cine_file: Union[str, bytes, PathLike],
+    func: Callable[[np.ndarray], Any],
+    workers: int = None,
+    slots: int = None,
+    start_frame: int = 1,
+    count: int = None,
+    context=None,
+) -> List[Any]:
+    """
+    Apply `func` to every frame in worker processes that receive the frames through a `FrameRing`
+
+    Decoding happens once in this process. Only slot indices and the (small) results of `func` cross process
+    boundaries. `func` must be picklable for the spawn and forkserver start methods.
+
+    Returns
+    -------
+    results : list
+        The results of `func` in frame order
+    """
+    context = context or multiprocessing.get_context()
+    workers = workers or os.cpu_count() or 1
+    header = read_header(cine_file)
+    if not count:
+        count = header["cinefileheader"].ImageCount - start_frame + 1
+
+    ring = FrameRing.for_clip(cine_file, slots or 2 * workers, context)
+    results = context.Queue()
+    processes = [context.Process(target=_consume, args=(ring, func, results), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    producer_errors = []
+
+    def run_producer():
+        try:
+            produce(cine_file, ring, start_frame, count, workers)
+        except Exception as e:
+            producer_errors.append(e)
+
+    producer = threading.Thread(target=run_producer, daemon=True)
+    producer.start()
+    try:
+        ordered = [None] * count
+        received = 0
+        while received < count:
+            try:
+                frame_number, result, error = results.get(timeout=0.5)
+            except queue.Empty:
+                if producer_errors:
+                    raise producer_errors[0]
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("All worker processes exited before every frame was processed")
+                continue
+            if error is not None:
+                raise error
+            ordered[frame_number - start_frame] = result
+            received += 1
+
+        producer.join()
+        for process in processes:
+            process.join()
+        return ordered
+    finally:
+        # On errors the producer may be blocked on a full ring, it is a daemon thread and ends with the interpreter
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        ring.close()
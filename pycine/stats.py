@@ -0,0 +1,292 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from os import PathLike
+from typing import List, Tuple, TypedDict, Union
+
+import numpy as np
+
+from pycine.file import read_header, Header
+from pycine.raw import Roi, create_raw_array, crop_roi, parallel_frame_reader, read_bpp, read_image_data
+
+TEMPORAL_OPS = ("mean", "sum", "std", "var", "min", "max")
+
+
+class FrameStats(TypedDict):
+    frame: np.ndarray
+    mean: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+    clipped: np.ndarray
+    histogram: np.ndarray
+
+
+def compute_frame_stats(
+    raw_image: np.ndarray, bpp: int, bins: int = 256, clip_level: int = None, row_step: int = 1, col_step: int = 1
+) -> Tuple[float, int, int, int, np.ndarray]:
+    """
+    Compute mean, min, max, clipped pixel count and a fixed-bin histogram of a single raw image
+
+    Parameters
+    ----------
+    raw_image : np.ndarray
+        An integer raw image
+    bpp : int
+        Bit depth of the raw image. The histogram covers `[0, 2**bpp)` with `bins` equally sized bins.
+    bins : int
+        Number of histogram bins
+    clip_level : int
+        Pixels at or above this value are counted as clipped. Defaults to `2**bpp - 1`.
+    row_step, col_step : int
+        Only sample every n-th row / column. Use odd steps to sample all CFA colors of a bayer sensor.
+
+    Returns
+    -------
+    mean, min, max, clipped, histogram
+    """
+    if clip_level is None:
+        clip_level = 2 ** bpp - 1
+
+    sample = raw_image[::row_step, ::col_step]
+
+    index_type = np.uint32 if bins * 2 ** bpp <= 2 ** 32 else np.uint64
+    index = (sample.astype(index_type) * bins) >> bpp
+    np.minimum(index, bins - 1, out=index)
+    histogram = np.bincount(index.ravel(), minlength=bins)
+
+    return (
+        sample.mean(dtype=np.float64),
+        sample.min(),
+        sample.max(),
+        np.count_nonzero(sample >= clip_level),
+        histogram,
+    )
+
+
+def empty_frame_stats(start_frame: int, count: int, bins: int = 256) -> FrameStats:
+    return {
+        "frame": np.arange(start_frame, start_frame + count),
+        "mean": np.zeros(count, dtype=np.float64),
+        "min": np.zeros(count, dtype=np.int64),
+        "max": np.zeros(count, dtype=np.int64),
+        "clipped": np.zeros(count, dtype=np.int64),
+        "histogram": np.zeros((count, bins), dtype=np.int64),
+    }
+
+
+def store_frame_stats(stats: FrameStats, i: int, result: Tuple[float, int, int, int, np.ndarray]):
+    """
+    Store the result of `compute_frame_stats` at position `i`
+    """
+    stats["mean"][i], stats["min"][i], stats["max"][i], stats["clipped"][i], stats["histogram"][i] = result
+
+
+def _decode_frame_stats(data: bytes, header: Header, normalize: bool, **kwargs):
+    return compute_frame_stats(create_raw_array(data, header, normalize), **kwargs)
+
+
+def frame_stats(
+    cine_file: Union[str, bytes, PathLike],
+    start_frame: int = 1,
+    count: int = None,
+    bins: int = 256,
+    clip_level: int = None,
+    row_step: int = 1,
+    col_step: int = 1,
+    normalize: bool = True,
+    workers: int = None,
+) -> FrameStats:
+    """
+    Stream over a clip and compute per-frame statistics
+
+    Frames are decoded and reduced in worker threads using `pycine.raw.parallel_frame_reader`, so only a few frames
+    are held in memory at any time.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    start_frame : int
+        First frame to read (1 based like `frame_reader`)
+    count : int
+        maximum number of frames to get.
+    bins : int
+        Number of histogram bins covering the full value range
+    clip_level : int
+        Pixels at or above this value are counted as clipped. Defaults to the maximum value of the bit depth.
+    row_step, col_step : int
+        Only sample every n-th row / column for speed
+    normalize : bool
+        If False, compute the statistics on the unpacked sensor values (e.g. 10bit P10 or 12bit P12L codes) and skip
+        the normalization step
+    workers : int
+        Number of worker threads
+
+    Returns
+    -------
+    stats : dict
+        Arrays of length `count` for `frame` (frame numbers), `mean`, `min`, `max` and `clipped` and a
+        `(count, bins)` array for `histogram`
+    """
+    header = read_header(cine_file)
+    if not count:
+        count = header["cinefileheader"].ImageCount - start_frame + 1
+
+    decode = partial(
+        _decode_frame_stats,
+        normalize=normalize,
+        bpp=read_bpp(header, normalize),
+        bins=bins,
+        clip_level=clip_level,
+        row_step=row_step,
+        col_step=col_step,
+    )
+
+    stats = empty_frame_stats(start_frame, count, bins)
+    results = parallel_frame_reader(cine_file, header, start_frame, count, workers=workers, decode=decode)
+    for i, result in enumerate(results):
+        store_frame_stats(stats, i, result)
+
+    return stats
+
+
+def _reduce_chunk(chunk: List[bytes], header: Header, op: str, normalize: bool, roi: Roi):
+    """
+    Reduce a chunk of frames to a partial result `(n, accumulator, m2)`. `m2` is only computed for std and var.
+    """
+    n = 0
+    accumulator = m2 = None
+    for data in chunk:
+        frame = crop_roi(create_raw_array(data, header, normalize), roi)
+        n += 1
+
+        if op in ("min", "max"):
+            if accumulator is None:
+                accumulator = frame.copy()
+            else:
+                (np.minimum if op == "min" else np.maximum)(accumulator, frame, out=accumulator)
+
+        elif op == "sum":
+            if accumulator is None:
+                accumulator = np.zeros(frame.shape, dtype=np.float64)
+            accumulator += frame
+
+        elif op == "mean":
+            # Running mean, the partial results are merged like Welford's means
+            if accumulator is None:
+                accumulator = frame.astype(np.float64)
+            else:
+                delta = frame - accumulator
+                delta /= n
+                accumulator += delta
+
+        else:
+            # Welford's online algorithm
+            x = frame.astype(np.float64)
+            if accumulator is None:
+                accumulator = x
+                m2 = np.zeros(frame.shape, dtype=np.float64)
+            else:
+                delta = x - accumulator
+                accumulator += delta / n
+                x -= accumulator
+                x *= delta
+                m2 += x
+
+    return n, accumulator, m2
+
+
+def _merge_partials(a, b, op: str):
+    """
+    Merge two partial results, using Chan's parallel algorithm for mean, std and var
+    """
+    n_a, accumulator_a, m2_a = a
+    n_b, accumulator_b, m2_b = b
+    n = n_a + n_b
+
+    if op in ("min", "max"):
+        return n, (np.minimum if op == "min" else np.maximum)(accumulator_a, accumulator_b), None
+    if op == "sum":
+        return n, accumulator_a + accumulator_b, None
+
+    delta = accumulator_b - accumulator_a
+    accumulator = accumulator_a + delta * (n_b / n)
+    if m2_a is not None:
+        delta **= 2
+        m2_a = m2_a + m2_b + delta * (n_a * n_b / n)
+    return n, accumulator, m2_a
+
+
+def temporal_reduce(
+    cine_file: Union[str, bytes, PathLike],
+    op: str = "mean",
+    chunk: int = 64,
+    start_frame: int = 1,
+    count: int = None,
+    roi: Roi = None,
+    normalize: bool = True,
+    workers: int = None,
+) -> np.ndarray:
+    """
+    Compute a per-pixel projection over time (e.g. a mean background or a max streak image)
+
+    The clip is read sequentially in chunks of frames. Each chunk is decoded and reduced in a worker thread with float64
+    accumulators and the partial results are merged in frame order. At most `workers` chunks are in flight, so memory
+    use does not depend on the clip length.
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    op : str
+        One of "mean", "sum", "std", "var" (population variance), "min" or "max"
+    chunk : int
+        Number of frames reduced by a worker at a time
+    start_frame : int
+        First frame to read (1 based like `frame_reader`)
+    count : int
+        maximum number of frames to get.
+    roi : tuple
+        Only reduce the region (top, bottom, left, right)
+    normalize : bool
+        If False, reduce the unpacked sensor values
+    workers : int
+        Number of worker threads. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    projection : np.ndarray
+        A float64 image for mean, sum, std and var, an image of the raw dtype for min and max
+    """
+    if op not in TEMPORAL_OPS:
+        raise ValueError(f"op must be one of {', '.join(TEMPORAL_OPS)}")
+
+    header = read_header(cine_file)
+    if not count:
+        count = header["cinefileheader"].ImageCount - start_frame + 1
+    if not workers:
+        workers = os.cpu_count() or 1
+
+    result = None
+    with open(cine_file, "rb") as f, ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for first_index in range(start_frame - 1, start_frame - 1 + count, chunk):
+            last_index = min(first_index + chunk, start_frame - 1 + count)
+            data = [read_image_data(f, header, frame_index) for frame_index in range(first_index, last_index)]
+            pending.append(executor.submit(_reduce_chunk, data, header, op, normalize, roi))
+
+            while pending and (len(pending) >= workers or pending[0].done()):
+                partial_result = pending.popleft().result()
+                result = partial_result if result is None else _merge_partials(result, partial_result, op)
+
+        while pending:
+            partial_result = pending.popleft().result()
+            result = partial_result if result is None else _merge_partials(result, partial_result, op)
+
+    n, accumulator, m2 = result
+    if op == "std":
+        return np.sqrt(m2 / n)
+    if op == "var":
+        return m2 / n
+    return accumulator
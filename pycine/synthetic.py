@@ -0,0 +1,210 @@
+import ctypes as ct
+import struct
+from os import PathLike
+from typing import Any, Generator, Iterable, Union
+
+import numpy as np
+
+from pycine import cine
+from pycine.file import read_header, Header
+
+# Name: (biCompression, biBitCount, RealBPP, BlackLevel, WhiteLevel)
+FORMATS = {
+    "8bit": (0, 8, 8, 0, 255),
+    "16bit": (0, 16, 12, 64, 4095),
+    "p10": (256, 16, 10, 64, 1014),
+    "p12l": (1024, 16, 12, 256, 4095),
+}
+
+# Largest native value of each format as stored in the image data
+MAX_CODES = {"8bit": 2 ** 8 - 1, "16bit": 2 ** 12 - 1, "p10": 2 ** 10 - 1, "p12l": 2 ** 12 - 1}
+
+
+def pack_10bit(unpacked: np.ndarray) -> bytes:
+    """
+    Pack 10bit values into P10 image data, the inverse of `pycine.raw.unpack_10bit`
+    """
+    values = unpacked.astype(np.uint16).reshape(-1, 4)
+    packed = np.empty((len(values), 5), dtype=np.uint8)
+    packed[:, 0] = values[:, 0] >> 2
+    packed[:, 1] = ((values[:, 0] & 0b11) << 6) | (values[:, 1] >> 4)
+    packed[:, 2] = ((values[:, 1] & 0b1111) << 4) | (values[:, 2] >> 6)
+    packed[:, 3] = ((values[:, 2] & 0b111111) << 2) | (values[:, 3] >> 8)
+    packed[:, 4] = values[:, 3] & 0xFF
+    return packed.tobytes()
+
+
+def pack_12bit(unpacked: np.ndarray) -> bytes:
+    """
+    Pack 12bit values into P12L image data, the inverse of `pycine.raw.unpack_12bit`
+    """
+    values = unpacked.astype(np.uint16).reshape(-1, 2)
+    packed = np.empty((len(values), 3), dtype=np.uint8)
+    packed[:, 0] = values[:, 0] >> 4
+    packed[:, 1] = ((values[:, 0] & 0b1111) << 4) | (values[:, 1] >> 8)
+    packed[:, 2] = values[:, 1] & 0xFF
+    return packed.tobytes()
+
+
+def encode_frame(unpacked: np.ndarray, image_format: str) -> bytes:
+    """
+    Get the image data of a frame from native sensor values (as returned by `create_raw_array(..., normalize=False)`)
+    """
+    if image_format == "p10":
+        return pack_10bit(unpacked)
+    if image_format == "p12l":
+        return pack_12bit(unpacked)
+    if image_format == "8bit":
+        return np.flipud(unpacked).astype(np.uint8).tobytes()
+    if image_format == "16bit":
+        return np.flipud(unpacked).astype("<u2").tobytes()
+    raise ValueError(f"Unknown format {image_format}, use one of {', '.join(FORMATS)}")
+
+
+def synthetic_frames(
+    width: int, height: int, count: int, max_code: int, seed: int = 0
+) -> Generator[np.ndarray, Any, None]:
+    """
+    Get a generator of reproducible test frames: a diagonal ramp with noise and a bright square that moves across
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[:height, :width]
+    ramp = (x + y) * (max_code * 0.8 / max(width + height - 2, 1))
+    size = max(min(width, height) // 8, 2)
+    for i in range(count):
+        frame = ramp + rng.normal(0, max_code * 0.01, (height, width))
+        left = i * 4 % max(width - size, 1)
+        frame[height // 2 - size // 2 : height // 2 + size // 2, left : left + size] = max_code
+        yield np.clip(frame, 0, max_code).astype(np.uint16)
+
+
+def write_synthetic_cine(
+    cine_file: Union[str, bytes, PathLike],
+    width: int = 512,
+    height: int = 256,
+    count: int = 16,
+    image_format: str = "p10",
+    cfa: int = 3,
+    frame_rate: float = 1000.0,
+    seed: int = 0,
+    frames: Iterable[np.ndarray] = None,
+    annotation_size: int = 8,
+) -> Header:
+    """
+    Write a valid cine file with synthetic content, e.g. for benchmarks and tests
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        Path of the cine file to write
+    width : int
+        Image width, a multiple of 4 for P10 and of 2 for P12L
+    height : int
+        Image height
+    count : int
+        Number of frames
+    image_format : str
+        One of `FORMATS`: "8bit", "16bit" (12 significant bits), "p10" or "p12l"
+    cfa : int
+        Color filter array code, e.g. 0 for monochrome, 3 for gbrg or 4 for rggb
+    frame_rate : float
+        Frame rate in frames per second, also used for the timestamps and exposure times
+    seed : int
+        Seed for the noise of `synthetic_frames`
+    frames : iterable
+        `count` arrays of native sensor values to write instead of `synthetic_frames`
+    annotation_size : int
+        Size of the annotation in front of every frame's image data, including its size fields. Cameras usually write
+        more than the minimal 8 bytes.
+
+    Returns
+    -------
+    header : dict
+        The header of the written file as read by `read_header`
+    """
+    if image_format not in FORMATS:
+        raise ValueError(f"Unknown format {image_format}, use one of {', '.join(FORMATS)}")
+    if annotation_size < 8:
+        raise ValueError("An annotation has at least 8 bytes")
+    alignment = {"p10": 4, "p12l": 2}.get(image_format, 1)
+    if width % alignment:
+        raise ValueError(f"The width of {image_format} frames must be a multiple of {alignment}")
+    compression, bit_count, real_bpp, black_level, white_level = FORMATS[image_format]
+    image_size = width * height * {"p10": 10, "p12l": 12}.get(image_format, bit_count) // 8
+
+    cinefileheader = cine.CINEFILEHEADER()
+    bitmapinfoheader = cine.BITMAPINFOHEADER()
+    setup = cine.SETUP()
+
+    setup.Length = ct.sizeof(setup)
+    setup.SoftwareVersion = 744
+    setup.FrameRate = int(round(frame_rate))
+    setup.dFrameRate = frame_rate
+    setup.fPbRate = setup.fTcRate = 24.0
+    setup.fWBTemp = 5600.0
+    setup.ImWidth = setup.ImWidthAcq = width
+    setup.ImHeight = setup.ImHeightAcq = height
+    setup.CFA = cfa
+    setup.RealBPP = real_bpp
+    setup.BlackLevel = black_level
+    setup.WhiteLevel = white_level
+    setup.ShutterNs = int(1e9 / frame_rate / 2)
+    setup.fGain = 1.0
+    setup.fGamma = 1.0
+    setup.cmCalib[:] = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0]
+
+    time_block = struct.pack("<IHH", 8 + 8 * count, 1002, 0)
+    exposure_block = struct.pack("<IHH", 8 + 4 * count, 1003, 0)
+    trigger_seconds = 1_600_000_000
+    for i in range(count):
+        seconds, fractions = divmod(trigger_seconds + i / frame_rate, 1)
+        time_block += struct.pack("<II", int(fractions * 2 ** 32) & ~0b11, int(seconds))
+        exposure_block += struct.pack("<I", int(setup.ShutterNs * 1e-9 * 2 ** 32))
+
+    cinefileheader.Type = 0x4943  # "CI"
+    cinefileheader.Headersize = ct.sizeof(cinefileheader)
+    cinefileheader.Compression = 0 if cfa == 0 else 2
+    cinefileheader.Version = 1
+    cinefileheader.TotalImageCount = cinefileheader.ImageCount = count
+    cinefileheader.OffImageHeader = ct.sizeof(cinefileheader)
+    cinefileheader.OffSetup = cinefileheader.OffImageHeader + ct.sizeof(bitmapinfoheader)
+    cinefileheader.OffImageOffsets = cinefileheader.OffSetup + setup.Length + len(time_block) + len(exposure_block)
+    cinefileheader.TriggerTime.seconds = trigger_seconds
+
+    bitmapinfoheader.biSize = ct.sizeof(bitmapinfoheader)
+    bitmapinfoheader.biWidth = width
+    bitmapinfoheader.biHeight = height
+    bitmapinfoheader.biPlanes = 1
+    bitmapinfoheader.biBitCount = bit_count
+    bitmapinfoheader.biCompression = compression
+    bitmapinfoheader.biSizeImage = image_size
+    bitmapinfoheader.biClrImportant = 2 ** real_bpp
+
+    first_image = cinefileheader.OffImageOffsets + 8 * count
+    p_image = [first_image + i * (annotation_size + image_size) for i in range(count)]
+
+    if frames is None:
+        frames = synthetic_frames(width, height, count, MAX_CODES[image_format], seed)
+
+    with open(cine_file, "wb") as f:
+        f.write(cinefileheader)
+        f.write(bitmapinfoheader)
+        f.write(setup)
+        f.write(time_block)
+        f.write(exposure_block)
+        f.write(struct.pack(f"<{count}q", *p_image))
+        written = 0
+        for frame in frames:
+            data = encode_frame(frame, image_format)
+            if len(data) != image_size:
+                raise ValueError(f"Frames must be {width}x{height}")
+            f.write(struct.pack("<I", annotation_size))
+            f.write(np.arange(annotation_size - 8, dtype=np.uint8).tobytes())
+            f.write(struct.pack("<I", image_size))
+            f.write(data)
+            written += 1
+
+    if written != count:
+        raise ValueError(f"Got {written} frames instead of {count}")
+
+    return read_header(cine_file)
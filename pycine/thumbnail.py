@@ -0,0 +1,107 @@
+from os import PathLike
+from typing import Union
+
+import numpy as np
+
+from pycine.color import BAYER_PATTERNS, preview_lut, resize, white_balance_gains
+from pycine.file import Header
+from pycine.profiling import profiled
+from pycine.raw import normalization_lut, read_bpp, unpack_sampled
+from pycine.reader import CineReader
+
+
+def sample_mosaic(data: bytes, header: Header, step: int = 8) -> np.ndarray:
+    """
+    Unpack every `step`-th row pair and column pair of a frame directly from its image data
+
+    Only the sampled pixels are unpacked, so the cost falls with `step ** 2`. Pixels are sampled in pairs, so the result
+    is a `(height // step, width // step)` mosaic with the CFA pattern of the full frame.
+
+    Parameters
+    ----------
+    data : bytes
+        The image data as stored in the cine file
+    header : dict
+        A dictionary contains header information of the cine file
+    step : int
+        Sample every `step`-th row pair and column pair
+
+    Returns
+    -------
+    mosaic : np.ndarray
+        The unpacked sensor values of the sampled pixels (see `unpack_raw_array`)
+    """
+    width, height = header["bitmapinfoheader"].biWidth, header["bitmapinfoheader"].biHeight
+    rows = (np.arange(0, height // 2, step)[:, None] * 2 + [0, 1]).ravel()
+    columns = (np.arange(0, width // 2, step)[:, None] * 2 + [0, 1]).ravel()
+    return unpack_sampled(data, header, rows, columns)
+
+
+@profiled("thumbnail", count="output")
+def thumbnail(data: bytes, header: Header, step: int = 8) -> np.ndarray:
+    """
+    Get an 8bit BGR thumbnail of a frame from its image data
+
+    Every pixel of the thumbnail is formed from one CFA quad of `sample_mosaic`, so no debayering or full frame decode is
+    needed. The white balance and gamma of `pycine.color.preview_8bit` are applied with one LUT per color.
+
+    Returns
+    -------
+    image : np.ndarray
+        A `(height // (2 * step), width // (2 * step), 3)` image
+    """
+    setup = header["setup"]
+    bpp = read_bpp(header)
+    values = np.take(normalization_lut(header), sample_mosaic(data, header, step), mode="clip")
+    image = np.empty((values.shape[0] // 2, values.shape[1] // 2, 3), dtype=np.uint8)
+
+    if setup.CFA in BAYER_PATTERNS:
+        gains = white_balance_gains(setup)
+        sites = {"r": [], "g": [], "b": []}
+        for color, (y, x) in zip(BAYER_PATTERNS[setup.CFA], [(0, 0), (0, 1), (1, 0), (1, 1)]):
+            sites[color].append(values[y::2, x::2])
+        green = sites["g"][0].astype(np.uint32) + sites["g"][1]
+        green >>= 1
+        for channel, (color, plane) in enumerate([("b", sites["b"][0]), ("g", green), ("r", sites["r"][0])]):
+            np.take(preview_lut(bpp, float(gains[color])), plane, out=image[..., channel], mode="clip")
+
+    elif setup.CFA == 0:
+        np.take(preview_lut(bpp), values[::2, ::2], out=image[..., 0], mode="clip")
+        image[..., 1] = image[..., 2] = image[..., 0]
+
+    else:
+        raise ValueError("Sensor not supported")
+
+    return image
+
+
+def clip_thumbnail(
+    cine_file: Union[str, bytes, PathLike], width: int = 320, frame_index: int = None, step: int = None
+) -> np.ndarray:
+    """
+    Get an 8bit BGR thumbnail of a clip
+
+    Parameters
+    ----------
+    cine_file : str or file-like object
+        A string containing a path to a cine file
+    width : int
+        Width of the thumbnail, the thumbnail keeps the sampled size if None
+    frame_index : int
+        Zero based index of the frame, the middle frame if None
+    step : int
+        Sample every `step`-th row pair and column pair. By default the largest step that gives at least `width`
+        pixels is used and the thumbnail is resized to `width`.
+    """
+    with CineReader(cine_file) as reader:
+        if not len(reader):
+            raise ValueError("The clip has no frames")
+        if frame_index is None:
+            frame_index = len(reader) // 2
+        if step is None:
+            step = max(reader.header["bitmapinfoheader"].biWidth // (2 * width), 1) if width else 8
+        image = thumbnail(reader.read_data(frame_index), reader.header, step)
+
+    if width and image.shape[1] != width:
+        image = resize(image, width)
+    return image
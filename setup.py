@@ -7,7 +7,16 @@ setup(
     author="Ben Hagen",
     author_email="ben@ottomatic.io",
     description="This package allows handling of .cine files created by Vision Research Phantom® cameras.",
-    entry_points={"console_scripts": ["pfs_meta = pycine.cli.pfs_meta:cli", "pfs_raw = pycine.cli.pfs_raw:cli"]},
+    entry_points={
+        "console_scripts": [
+            "pfs_meta = pycine.cli.pfs_meta:cli",
+            "pfs_raw = pycine.cli.pfs_raw:cli",
+            "pfs_events = pycine.cli.pfs_events:cli",
+            "pfs_serve = pycine.cli.pfs_serve:cli",
+            "pfs_copy = pycine.cli.pfs_copy:cli",
+        ]
+    },
+    extras_require={"numba": ["numba"]},
     include_package_data=True,
     install_requires=["click", "docopt", "opencv-python", "colorama", "timecode"],
     long_description=long_description,
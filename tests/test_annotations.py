@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from pycine.follow import follow_frames
+from pycine.raw import frame_reader, read_image_data
+from pycine.reader import CineReader
+from pycine.synthetic import encode_frame, synthetic_frames, write_synthetic_cine
+
+WIDTH, HEIGHT, COUNT = 64, 32, 3
+
+
+@pytest.fixture(params=[8, 40, 1034])
+def clip(request, tmp_path):
+    cine_file = tmp_path / "clip.cine"
+    frames = list(synthetic_frames(WIDTH, HEIGHT, COUNT, 2 ** 10 - 1))
+    header = write_synthetic_cine(cine_file, WIDTH, HEIGHT, COUNT, "p10", frames=frames, annotation_size=request.param)
+    return cine_file, header, frames
+
+
+def test_read_image_data_skips_annotation(clip):
+    cine_file, header, frames = clip
+    with open(cine_file, "rb") as f:
+        for frame_index, frame in enumerate(frames):
+            assert read_image_data(f, header, frame_index) == encode_frame(frame, "p10")
+
+
+def test_readers_skip_annotation(clip):
+    cine_file, header, frames = clip
+    expected = np.stack(frames)
+    np.testing.assert_array_equal(np.stack(list(frame_reader(cine_file, header, normalize=False))), expected)
+    with CineReader(cine_file) as reader:
+        np.testing.assert_array_equal(np.stack(list(reader.frames(normalize=False))), expected)
+    followed = [raw_image for _, raw_image in follow_frames(cine_file, normalize=False, timeout=1)]
+    np.testing.assert_array_equal(np.stack(followed), expected)
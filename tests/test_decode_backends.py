@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+
+from pycine.calibration import Calibration
+from pycine.file import read_header
+from pycine.raw import create_raw_array
+
+pytest.importorskip("numba")
+
+CHART = os.path.join(os.path.dirname(__file__), os.pardir, "testfiles", "chart1.cine")
+WIDTH, HEIGHT = 256, 256
+# Name: (biCompression, biBitCount, RealBPP, BlackLevel, WhiteLevel, bits per pixel of the image data)
+FORMATS = {
+    "8bit": (0, 8, 8, 0, 255, 8),
+    "16bit": (0, 16, 12, 64, 4095, 16),
+    "p10": (256, 16, 10, 64, 1014, 10),
+    "p12l": (1024, 16, 12, 256, 4095, 12),
+}
+OPTIONS = [(False, None), (True, None), (True, np.uint16), (True, np.uint8), (True, np.float32)]
+
+
+def clip_header(image_format: str, cfa: int = 0) -> dict:
+    compression, bit_count, real_bpp, black_level, white_level, bits = FORMATS[image_format]
+    header = read_header(CHART)
+    header["bitmapinfoheader"].biWidth = WIDTH
+    header["bitmapinfoheader"].biHeight = HEIGHT
+    header["bitmapinfoheader"].biCompression = compression
+    header["bitmapinfoheader"].biBitCount = bit_count
+    header["bitmapinfoheader"].biSizeImage = WIDTH * HEIGHT * bits // 8
+    header["setup"].CFA = cfa
+    header["setup"].RealBPP = real_bpp
+    header["setup"].BlackLevel = black_level
+    header["setup"].WhiteLevel = white_level
+    return header
+
+
+@pytest.fixture(scope="module", params=[(image_format, cfa) for image_format in FORMATS for cfa in (0, 3, 4)])
+def clip(request):
+    header = clip_header(*request.param)
+    # Random image data holds every code of the container, including codes above the white level
+    rng = np.random.default_rng(0)
+    size = header["bitmapinfoheader"].biSizeImage
+    return header, [rng.integers(0, 256, size, dtype=np.uint8).tobytes() for _ in range(3)]
+
+
+@pytest.mark.parametrize("normalize, dtype", OPTIONS)
+def test_numba_matches_numpy(clip, normalize, dtype):
+    header, frames = clip
+    for data in frames:
+        expected = create_raw_array(data, header, normalize, dtype, backend="numpy")
+        actual = create_raw_array(data, header, normalize, dtype, backend="numba")
+        assert actual.dtype == expected.dtype
+        assert actual.shape == expected.shape
+        np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("dtype", [None, np.uint8, np.float32])
+def test_numba_calibration_matches_numpy(clip, dtype):
+    header, frames = clip
+    rng = np.random.default_rng(1)
+    calibration = Calibration(rng.uniform(0, 0.1, (HEIGHT, WIDTH)), rng.uniform(0.8, 1.25, (HEIGHT, WIDTH)))
+    for data in frames:
+        expected = create_raw_array(data, header, dtype=dtype, backend="numpy", calibration=calibration)
+        actual = create_raw_array(data, header, dtype=dtype, backend="numba", calibration=calibration)
+        assert actual.dtype == expected.dtype
+        np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("image_format", ["p10", "p12l"])
+def test_numba_rejects_short_data(image_format):
+    header = clip_header(image_format)
+    data = bytes(header["bitmapinfoheader"].biSizeImage // 2)
+    with pytest.raises(ValueError):
+        create_raw_array(data, header, backend="numba")
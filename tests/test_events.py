@@ -0,0 +1,22 @@
+import pytest
+
+from pycine.events import find_events
+from pycine.synthetic import write_synthetic_cine
+
+
+@pytest.fixture(scope="module")
+def cine_file(tmp_path_factory):
+    cine_file = tmp_path_factory.mktemp("clips") / "clip.cine"
+    write_synthetic_cine(cine_file, 64, 32, 6)
+    return cine_file
+
+
+@pytest.mark.parametrize("start_frame, count", [(7, None), (0, None), (1, -1)])
+def test_find_events_rejects_empty_ranges(cine_file, start_frame, count):
+    with pytest.raises(ValueError):
+        find_events(cine_file, start_frame=start_frame, count=count)
+
+
+def test_find_events_limits_count_to_clip(cine_file):
+    assert find_events(cine_file, start_frame=6) == []
+    assert find_events(cine_file, count=100) == find_events(cine_file)
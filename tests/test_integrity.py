@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from pycine.file import check_frames, recover_header
+from pycine.raw import frame_reader
+from pycine.synthetic import write_synthetic_cine
+
+WIDTH, HEIGHT, COUNT, ANNOTATION_SIZE = 64, 32, 4, 1034
+IMAGE_SIZE = WIDTH * HEIGHT * 10 // 8
+
+
+@pytest.mark.parametrize(
+    "cut",
+    [
+        # Inside the annotation, after the smallest possible frame and inside the image data
+        100,
+        8 + IMAGE_SIZE,
+        ANNOTATION_SIZE + IMAGE_SIZE // 2,
+        ANNOTATION_SIZE + IMAGE_SIZE - 1,
+    ],
+)
+def test_truncated_last_frame(tmp_path, cut):
+    cine_file = tmp_path / "clip.cine"
+    header = write_synthetic_cine(cine_file, WIDTH, HEIGHT, COUNT, "p10", annotation_size=ANNOTATION_SIZE)
+    with open(cine_file, "r+b") as f:
+        f.truncate(header["pImage"][-1] + cut)
+
+    np.testing.assert_array_equal(check_frames(cine_file), [True] * (COUNT - 1) + [False])
+    recovered = recover_header(cine_file)
+    assert len(list(frame_reader(cine_file, recovered))) == COUNT - 1
+
+
+def test_intact_clip(tmp_path):
+    cine_file = tmp_path / "clip.cine"
+    header = write_synthetic_cine(cine_file, WIDTH, HEIGHT, COUNT, "p10", annotation_size=ANNOTATION_SIZE)
+    assert check_frames(cine_file).all()
+    assert recover_header(cine_file)["pImage"] == header["pImage"]
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from pycine.cli.pfs_meta import cli
+from pycine.file import read_header
+from pycine.metadata import read_metadata, write_header
+from pycine.synthetic import write_synthetic_cine
+
+
+def test_metadata_round_trip(tmp_path):
+    cine_file = tmp_path / "clip.cine"
+    write_synthetic_cine(cine_file, 64, 32, 2)
+
+    header = read_metadata(cine_file)
+    assert set(header) == {"cinefileheader", "bitmapinfoheader", "setup"}
+    header["setup"].fWBTemp = 3200.0
+    write_header(cine_file, header, backup=False)
+    assert read_header(cine_file)["setup"].fWBTemp == 3200.0
+
+
+def test_pfs_meta_does_not_import_numpy(tmp_path):
+    code = "import json, sys, pycine.cli.pfs_meta; print(json.dumps('numpy' in sys.modules))"
+    assert not json.loads(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True).stdout)
+
+    cine_file = tmp_path / "clip.cine"
+    write_synthetic_cine(cine_file, 64, 32, 2)
+    result = CliRunner().invoke(cli, ["check", str(cine_file)])
+    assert result.exit_code == 0, result.output
@@ -0,0 +1,37 @@
+import operator
+
+import numpy as np
+import pytest
+
+from pycine.parallel import map_frames
+from pycine.reader import CineReader
+from pycine.synthetic import write_synthetic_cine
+
+WIDTH, HEIGHT, COUNT = 64, 32, 6
+
+
+def first_pixel(raw_image: np.ndarray) -> list:
+    return [int(raw_image[0, 0])]
+
+
+@pytest.fixture(scope="module")
+def cine_file(tmp_path_factory):
+    cine_file = tmp_path_factory.mktemp("clips") / "clip.cine"
+    frames = [np.full((HEIGHT, WIDTH), 100 * i + 64, dtype=np.uint16) for i in range(COUNT)]
+    write_synthetic_cine(cine_file, WIDTH, HEIGHT, COUNT, "p10", frames=frames)
+    # Load the decode backend before the workers are forked instead of once per worker
+    with CineReader(cine_file) as reader:
+        reader.get(0)
+    return cine_file
+
+
+@pytest.mark.parametrize("frames", [None, [5, 1, 3], [4, 0, 2, 5, 1, 3]])
+def test_map_frames_reduces_in_order_of_frames(cine_file, frames):
+    results = map_frames(cine_file, first_pixel, frames, workers=2, chunk=2)
+    reduced = map_frames(cine_file, first_pixel, frames, workers=2, chunk=2, reduce=operator.add)
+    assert reduced == sum(results, [])
+
+
+def test_map_frames_rejects_reducing_no_frames(cine_file):
+    with pytest.raises(ValueError):
+        map_frames(cine_file, first_pixel, [], workers=1, reduce=operator.add)